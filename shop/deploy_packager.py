@@ -0,0 +1,202 @@
+"""
+Đóng gói deploy website Tiệm Bánh Netflix theo từng phần thay đổi
+Tạo thư mục dist/ từ thư mục gốc website, kèm manifest hash nội dung. So với manifest
+của lần deploy trước để chỉ xuất các file đã thay đổi (nén gzip song song), deploy chỉ cần đẩy phần này.
+
+Cách dùng:
+    python deploy_packager.py            # Xuất file thay đổi so với lần deploy trước
+    python deploy_packager.py --full     # Xuất toàn bộ website
+    python deploy_packager.py --commit   # Sau khi deploy xong: ghi nhận gói vừa tạo đã được deploy
+
+Chạy lại nhiều lần trước khi deploy vẫn luôn so với lần deploy trước, không làm mất thay đổi.
+
+Kết quả trong dist/:
+    manifest.json          - hash + kích thước các file của lần deploy trước (chỉ đổi khi --commit)
+    pending-manifest.json  - manifest của gói vừa tạo, thành manifest.json khi --commit
+    changes.json           - danh sách file thêm mới / thay đổi / đã xóa so với lần deploy trước
+    site/                  - bản sao các file thay đổi (+ bản .gz cho file dạng text)
+"""
+
+import os
+import sys
+import json
+import gzip
+import shutil
+import fnmatch
+import hashlib
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+# Đường dẫn
+SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
+SITE_ROOT = os.path.dirname(SCRIPT_DIR)
+DIST_DIR = os.path.join(SITE_ROOT, 'dist')
+
+# File/thư mục không deploy: so khớp theo tên từng phần của đường dẫn,
+# mẫu bắt đầu bằng '/' thì so với cả đường dẫn tính từ gốc website (như .gitignore)
+EXCLUDE_PATTERNS = [
+    '.*',               # .git, .gitignore, file trạng thái build/cache
+    'dist',
+    'tests',
+    '__pycache__',
+    '*.py',
+    '*.pyc',
+    '*.md',             # Tài liệu nội bộ (PROJECT_CONTEXT.md)
+    '/requests.jsonl',   # Chỉ file nội bộ ở gốc, không phải feed shop/feeds/products.jsonl
+    '*.tmp',
+    'catalog.db',
+]
+
+# File dạng text được nén sẵn .gz để server trả về trực tiếp
+COMPRESSIBLE_EXTENSIONS = {'.html', '.js', '.css', '.json', '.svg', '.xml', '.txt', '.csv', '.webmanifest'}
+
+def is_excluded(rel_path, patterns=EXCLUDE_PATTERNS):
+    """Kiểm tra đường dẫn (tương đối, dùng '/') có bị loại khỏi deploy không"""
+    parts = rel_path.split('/')
+    for pattern in patterns:
+        if pattern.startswith('/'):
+            if fnmatch.fnmatch(rel_path, pattern[1:]):
+                return True
+        elif any(fnmatch.fnmatch(part, pattern) for part in parts):
+            return True
+    return False
+
+def iter_site_files(root=SITE_ROOT, patterns=EXCLUDE_PATTERNS):
+    """Duyệt các file cần deploy, trả về đường dẫn tương đối dạng 'a/b.html'"""
+    for dirpath, dirnames, filenames in os.walk(root):
+        rel_dir = os.path.relpath(dirpath, root).replace(os.sep, '/')
+        rel_dir = '' if rel_dir == '.' else rel_dir + '/'
+        # Bỏ qua cả thư mục bị loại để không phải duyệt vào trong
+        dirnames[:] = sorted(d for d in dirnames if not is_excluded(rel_dir + d, patterns))
+        for filename in sorted(filenames):
+            rel_path = rel_dir + filename
+            if not is_excluded(rel_path, patterns):
+                yield rel_path
+
+def hash_file(path):
+    """SHA-256 nội dung file (đọc từng khối 1MB)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+def load_manifest(path):
+    """Tải manifest lần trước {rel_path: {"sha256", "size", "mtime"}}, chưa có thì trả về {}"""
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f).get('files', {})
+    return {}
+
+def build_manifest(root=SITE_ROOT, previous=None, workers=None):
+    """
+    Tạo manifest cho toàn bộ website. File có cùng mtime + kích thước với manifest
+    lần trước thì dùng lại hash cũ, chỉ hash lại file thực sự có thể đã đổi.
+    """
+    previous = previous or {}
+    entries = {}
+    to_hash = []
+    for rel_path in iter_site_files(root):
+        stat = os.stat(os.path.join(root, rel_path))
+        entry = {"size": stat.st_size, "mtime": stat.st_mtime_ns}
+        old = previous.get(rel_path)
+        if old and old.get('size') == entry['size'] and old.get('mtime') == entry['mtime']:
+            entry['sha256'] = old['sha256']
+        else:
+            to_hash.append(rel_path)
+        entries[rel_path] = entry
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        hashes = executor.map(lambda p: hash_file(os.path.join(root, p)), to_hash)
+        for rel_path, digest in zip(to_hash, hashes):
+            entries[rel_path]['sha256'] = digest
+    return entries
+
+def diff_manifests(previous, current):
+    """So sánh 2 manifest theo hash, trả về {"added", "modified", "deleted"}"""
+    return {
+        "added": sorted(p for p in current if p not in previous),
+        "modified": sorted(p for p in current if p in previous and previous[p]['sha256'] != current[p]['sha256']),
+        "deleted": sorted(p for p in previous if p not in current),
+    }
+
+def emit_file(root, rel_path, out_dir):
+    """Sao chép 1 file vào thư mục đầu ra, kèm bản .gz nếu là file text; trả về số byte đã ghi"""
+    src = os.path.join(root, rel_path)
+    dest = os.path.join(out_dir, rel_path)
+    os.makedirs(os.path.dirname(dest), exist_ok=True)
+    shutil.copy2(src, dest)
+    written = os.path.getsize(dest)
+
+    if os.path.splitext(rel_path)[1].lower() in COMPRESSIBLE_EXTENSIONS:
+        # mtime=0 để cùng nội dung luôn cho ra cùng file .gz
+        with open(src, 'rb') as f_in, open(dest + '.gz', 'wb') as raw:
+            with gzip.GzipFile(filename='', mode='wb', fileobj=raw, compresslevel=9, mtime=0) as f_out:
+                shutil.copyfileobj(f_in, f_out)
+        written += os.path.getsize(dest + '.gz')
+    return written
+
+def package(root=SITE_ROOT, dist_dir=DIST_DIR, full=False, workers=None):
+    """
+    Đóng gói deploy: tạo manifest mới, so với manifest đã deploy và xuất file thay đổi vào dist/site/.
+    Manifest đã deploy không bị đổi (xem commit). Trả về (changes, số byte đã xuất).
+    """
+    deployed = load_manifest(os.path.join(dist_dir, 'manifest.json'))
+    pending_file = os.path.join(dist_dir, 'pending-manifest.json')
+    # Dùng lại hash của cả gói chưa deploy lẫn lần deploy trước nếu file không đổi mtime + kích thước
+    known = dict(deployed, **load_manifest(pending_file))
+    current = build_manifest(root, known, workers)
+    changes = diff_manifests({} if full else deployed, current)
+
+    site_dir = os.path.join(dist_dir, 'site')
+    if os.path.exists(site_dir):
+        shutil.rmtree(site_dir)
+    os.makedirs(site_dir)
+
+    to_emit = changes['added'] + changes['modified']
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        total_bytes = sum(executor.map(lambda p: emit_file(root, p, site_dir), to_emit))
+
+    with open(os.path.join(dist_dir, 'changes.json'), 'w', encoding='utf-8') as f:
+        json.dump(changes, f, ensure_ascii=False, indent=2)
+    with open(pending_file, 'w', encoding='utf-8') as f:
+        json.dump({"files": current}, f, ensure_ascii=False, indent=1, sort_keys=True)
+    return changes, total_bytes
+
+def commit(dist_dir=DIST_DIR):
+    """
+    Ghi nhận gói vừa tạo đã được deploy: manifest của gói thành manifest đã deploy,
+    lần đóng gói sau chỉ xuất thay đổi kể từ gói này. Trả về False nếu chưa có gói nào.
+    """
+    pending_file = os.path.join(dist_dir, 'pending-manifest.json')
+    if not os.path.exists(pending_file):
+        return False
+    os.replace(pending_file, os.path.join(dist_dir, 'manifest.json'))
+    return True
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Đóng gói deploy website theo phần thay đổi")
+    parser.add_argument('--full', action='store_true', help="Xuất toàn bộ file, không so với lần trước")
+    parser.add_argument('--dist', default=DIST_DIR, help="Thư mục đầu ra (mặc định dist/ ở gốc website)")
+    parser.add_argument('--workers', type=int, default=None, help="Số thread hash/nén song song")
+    parser.add_argument('--commit', action='store_true', help="Ghi nhận gói vừa tạo đã deploy xong")
+    args = parser.parse_args(argv)
+    
+    if args.commit:
+        if not commit(args.dist):
+            print("Chưa có gói nào để ghi nhận, hãy chạy đóng gói trước")
+            return 1
+        print("✅ Đã ghi nhận deploy, lần đóng gói sau chỉ xuất thay đổi kể từ gói này")
+        return 0
+
+    changes, total_bytes = package(dist_dir=args.dist, full=args.full, workers=args.workers)
+    print(f"➕ Thêm mới: {len(changes['added'])} file")
+    print(f"✏️ Thay đổi: {len(changes['modified'])} file")
+    print(f"🗑️ Đã xóa: {len(changes['deleted'])} file")
+    for rel_path in changes['added'] + changes['modified']:
+        print(f"   {rel_path}")
+    print(f"📦 Đã xuất {total_bytes / 1024:.1f} KB vào {os.path.join(args.dist, 'site')}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -9,66 +9,1142 @@ Yêu cầu cài đặt:
 import json
 import os
 import tkinter as tk
-from tkinter import ttk, messagebox, filedialog
+from tkinter import ttk, messagebox, filedialog, simpledialog
 import shutil
 import re
 import io
+import copy
+import hashlib
+import bisect
+import mmap
+import codecs
+import itertools
+import html
+import csv
+from xml.sax.saxutils import escape as xml_escape
+import functools
+from collections import deque, OrderedDict
+import sys
+import time
+import asyncio
+import argparse
+import threading
+import contextlib
+import http.client
+import sqlite3
+from urllib.parse import urlsplit, urljoin, quote
+from concurrent.futures import ThreadPoolExecutor
 
-# Kiểm tra và import thư viện tạo QR
+# Pillow: xuất ảnh QR và giải mã ảnh xem trước
 try:
-    import qrcode
     from PIL import Image
-    QR_AVAILABLE = True
+except ImportError:
+    Image = None
+
+# Kiểm tra và import thư viện tạo QR (cần thêm Pillow)
+try:
+    import qrcode
+    QR_AVAILABLE = Image is not None
 except ImportError:
     QR_AVAILABLE = False
+if not QR_AVAILABLE:
     print("⚠️ Chưa cài đặt thư viện qrcode/pillow. Chạy: pip install qrcode pillow")
 
+# ImageTk chỉ cần cho xem trước ảnh trong GUI (một số bản Pillow của distro tách riêng gói này)
+try:
+    from PIL import ImageTk
+    PREVIEW_AVAILABLE = Image is not None
+except ImportError:
+    PREVIEW_AVAILABLE = False
+
+# Khóa file khi ghi: fcntl trên Linux/macOS, msvcrt trên Windows
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
 # Đường dẫn file
 SCRIPT_DIR = os.path.dirname(os.path.abspath(__file__))
 PRODUCTS_FILE = os.path.join(SCRIPT_DIR, 'products.json')
 PRODUCTS_JS_FILE = os.path.join(SCRIPT_DIR, 'products-data.js')
 FEATURED_FILE = os.path.join(SCRIPT_DIR, 'featured-products.json')
 FEATURED_JS_FILE = os.path.join(SCRIPT_DIR, 'featured-products.js')
+SHOP_HTML_FILE = os.path.join(SCRIPT_DIR, 'index.html')
+SITE_ROOT = os.path.dirname(SCRIPT_DIR)
+FEEDS_DIR = os.path.join(SCRIPT_DIR, 'feeds')
+FEED_STATE_FILE = os.path.join(SCRIPT_DIR, '.feed-state.json')  # Dấu vân tay sản phẩm của lần xuất feed đã được ghi nhận
 AFF_DATA_DIR = os.path.join(os.path.dirname(SCRIPT_DIR), 'aff-data')
+CATALOG_DB_FILE = os.path.join(SCRIPT_DIR, 'catalog.db')  # Có file này thì SQLite là nguồn dữ liệu chính
+BUILD_STATE_FILE = os.path.join(SCRIPT_DIR, '.build-state.json')  # Dấu vân tay đầu vào của các file build ra
+# Cách xuất QR cho web: 'svg' = nhúng SVG (data URI) thẳng vào products-data.js, không tốn request ảnh;
+# 'webp' = file ảnh riêng trong aff-data/ như trước
+QR_OUTPUT = 'svg'
+FEATURED_SLOTS = 4  # Số slot sản phẩm trong modal quảng cáo
+WATCH_INTERVAL_MS = 2000  # Chu kỳ kiểm tra products.json bị sửa từ bên ngoài
+UNDO_DEPTH = 100  # Số thao tác tối đa có thể hoàn tác
+SAVE_DEBOUNCE_MS = 400  # Gộp nhiều lần hoàn tác/làm lại liên tiếp thành 1 lần lưu
+STREAM_LOAD_THRESHOLD = 2 * 1024 * 1024  # products.json lớn hơn mức này thì GUI tải dần từng đợt
+STREAM_BATCH = 500  # Số sản phẩm mỗi đợt tải dần
+PREVIEW_SIZE = (160, 160)  # Kích thước tối đa ảnh xem trước
+PREVIEW_CACHE_SIZE = 64  # Số ảnh xem trước giữ trong bộ nhớ (LRU)
+LINK_CHECK_CACHE_FILE = os.path.join(SCRIPT_DIR, '.link-check-cache.json')
+LINK_CHECK_TTL = 6 * 3600  # Kết quả kiểm tra link được dùng lại trong 6 giờ
+IMAGE_CACHE_DIR = os.path.join(SCRIPT_DIR, '.image-cache')  # Ảnh tải từ URL, tên file theo hash của URL
+IMAGE_DOWNLOAD_RETRIES = 3  # Số lần thử lại khi tải ảnh lỗi mạng / lỗi 5xx
+CATALOG_LOCK_FILE = os.path.join(SCRIPT_DIR, '.catalog.lock')  # Khóa advisory, chỉ giữ trong lúc ghi
+CATALOG_LOCK_TIMEOUT = 10  # Số giây chờ tối đa khi người khác đang ghi
+SAVE_CONFLICT_RETRIES = 3  # Số lần gộp + ghi lại khi phiên bản trên đĩa đã thay đổi
+BUILD_DEBOUNCE_MS = 1500  # Khi dùng SQLite: gộp nhiều lần sửa thành 1 lần build lại file web
+
+class CatalogStore:
+    """
+    Kho sản phẩm SQLite (tùy chọn). Khi dùng, catalog.db là nguồn dữ liệu chính,
+    còn products.json / products-data.js / featured-products.* chỉ là file build ra.
+    Mỗi sản phẩm là 1 dòng, có chỉ mục theo id và position.
+    """
+    
+    def __init__(self, path=None):
+        self.path = path or CATALOG_DB_FILE
+        self.conn = sqlite3.connect(self.path)
+        self.conn.executescript("""
+            CREATE TABLE IF NOT EXISTS products (
+                id TEXT PRIMARY KEY,
+                position INTEGER NOT NULL,
+                data TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS idx_products_position ON products(position);
+            CREATE TABLE IF NOT EXISTS featured (
+                slot INTEGER PRIMARY KEY,
+                data TEXT NOT NULL
+            );
+        """)
+    
+    def close(self):
+        self.conn.close()
+    
+    def iter_products(self):
+        """Đọc lần lượt từng sản phẩm theo position (không tải hết vào bộ nhớ)"""
+        for (data,) in self.conn.execute("SELECT data FROM products ORDER BY position"):
+            yield json.loads(data)
+    
+    def load_products(self):
+        return list(self.iter_products())
+    
+    def get_version(self):
+        """Bộ đếm phiên bản danh sách sản phẩm, tăng 1 mỗi lần ghi có thay đổi"""
+        return self.conn.execute("PRAGMA user_version").fetchone()[0]
+    
+    def _bump_version(self):
+        # Gọi trong transaction đang ghi để phiên bản đổi cùng lúc với dữ liệu
+        self.conn.execute(f"PRAGMA user_version = {self.get_version() + 1}")
+    
+    def update_products(self, products):
+        """Cập nhật nội dung các sản phẩm đã có (mỗi sản phẩm 1 dòng UPDATE theo id), trong 1 transaction"""
+        with self.conn:
+            self.conn.executemany(
+                "UPDATE products SET data = ? WHERE id = ?",
+                [(json.dumps(p, ensure_ascii=False), p['id']) for p in products]
+            )
+            self._bump_version()
+    
+    def save_products(self, products):
+        """Lưu cả danh sách nhưng chỉ ghi các dòng thay đổi (nội dung hoặc vị trí), trong 1 transaction"""
+        existing = {pid: (position, data) for pid, position, data in
+                    self.conn.execute("SELECT id, position, data FROM products")}
+        changed = []
+        for position, product in enumerate(products):
+            data = json.dumps(product, ensure_ascii=False)
+            if existing.pop(product['id'], None) != (position, data):
+                changed.append((product['id'], position, data))
+        
+        with self.conn:
+            if existing:
+                self.conn.executemany("DELETE FROM products WHERE id = ?", [(pid,) for pid in existing])
+            self.conn.executemany(
+                "INSERT INTO products (id, position, data) VALUES (?, ?, ?) "
+                "ON CONFLICT(id) DO UPDATE SET position = excluded.position, data = excluded.data",
+                changed
+            )
+            if changed or existing:
+                self._bump_version()
+        return len(changed) + len(existing)
+    
+    def load_featured(self):
+        rows = self.conn.execute("SELECT data FROM featured ORDER BY slot")
+        return [json.loads(data) for (data,) in rows]
+    
+    def save_featured(self, featured_products):
+        with self.conn:
+            self.conn.execute("DELETE FROM featured")
+            self.conn.executemany(
+                "INSERT INTO featured (slot, data) VALUES (?, ?)",
+                [(slot, json.dumps(p, ensure_ascii=False)) for slot, p in enumerate(featured_products)]
+            )
+
+_catalog_store = None
+
+def get_catalog_store():
+    """Trả về CatalogStore nếu đang dùng SQLite (có file catalog.db), ngược lại None"""
+    global _catalog_store
+    if _catalog_store is None and os.path.exists(CATALOG_DB_FILE):
+        _catalog_store = CatalogStore()
+    return _catalog_store
+
+def catalog_source_file():
+    """File chứa nguồn dữ liệu chính: catalog.db nếu có, ngược lại products.json"""
+    return CATALOG_DB_FILE if get_catalog_store() else PRODUCTS_FILE
 
 def load_products():
-    """Tải danh sách sản phẩm từ file JSON"""
+    """Tải danh sách sản phẩm (từ SQLite nếu có, ngược lại từ file JSON)"""
+    store = get_catalog_store()
+    if store:
+        return store.load_products()
     if os.path.exists(PRODUCTS_FILE):
         with open(PRODUCTS_FILE, 'r', encoding='utf-8') as f:
             return json.load(f)
     return []
 
+def iter_json_array(path, chunk_size=64 * 1024):
+    """
+    Đọc lần lượt từng phần tử của file mảng JSON (qua mmap, giải mã UTF-8 từng đoạn),
+    phần tử đầu tiên có ngay mà không cần parse cả file.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            utf8 = codecs.getincrementaldecoder('utf-8-sig')()
+            buf, pos, offset = '', 0, 0
+            
+            def more():
+                """Đọc thêm 1 đoạn vào buffer, trả về False nếu đã hết file"""
+                nonlocal buf, pos, offset
+                if offset >= len(mm):
+                    return False
+                chunk = mm[offset:offset + chunk_size]
+                offset += len(chunk)
+                buf = buf[pos:] + utf8.decode(chunk, final=offset >= len(mm))
+                pos = 0
+                return True
+            
+            def next_token():
+                """Bỏ qua khoảng trắng, trả về ký tự kế tiếp ('' nếu hết file)"""
+                nonlocal pos
+                while True:
+                    while pos < len(buf) and buf[pos] in ' \t\r\n':
+                        pos += 1
+                    if pos < len(buf) or not more():
+                        return buf[pos:pos + 1]
+            
+            if next_token() != '[':
+                raise ValueError(f"{path} không phải mảng JSON")
+            pos += 1
+            if next_token() == ']':
+                return
+            while True:
+                next_token()
+                try:
+                    item, end = decoder.raw_decode(buf, pos)
+                except json.JSONDecodeError:
+                    # Phần tử chưa đọc đủ -> đọc thêm rồi thử lại
+                    if not more():
+                        raise
+                    continue
+                # Số ở cuối đoạn có thể bị cắt (12|345, 1.5|e10): chỉ nhận phần tử khi
+                # ngay sau nó là dấu phân cách, hoặc đã hết file
+                if (end == len(buf) or buf[end] not in ' \t\r\n,]') and more():
+                    continue
+                pos = end
+                yield item
+                token = next_token()
+                pos += 1
+                if token == ']':
+                    return
+                if token != ',':
+                    raise ValueError(f"{path}: JSON không hợp lệ gần vị trí {offset - len(buf) + pos}")
+
+def iter_products():
+    """Đọc lần lượt từng sản phẩm từ nguồn dữ liệu chính"""
+    store = get_catalog_store()
+    if store:
+        return store.iter_products()
+    if os.path.exists(PRODUCTS_FILE):
+        return iter_json_array(PRODUCTS_FILE)
+    return iter(())
+
+def write_json_array(f, items, indent=4):
+    """Ghi mảng JSON từng phần tử một (cùng định dạng với json.dump(..., indent=4))"""
+    pad = ' ' * indent
+    first = True
+    for item in items:
+        f.write('[\n' + pad if first else ',\n' + pad)
+        f.write(json.dumps(item, ensure_ascii=False, indent=indent).replace('\n', '\n' + pad))
+        first = False
+    f.write('[]' if first else '\n]')
+
 def load_featured():
     """Tải danh sách sản phẩm featured cho modal"""
+    store = get_catalog_store()
+    if store:
+        return store.load_featured()
     if os.path.exists(FEATURED_FILE):
         with open(FEATURED_FILE, 'r', encoding='utf-8') as f:
             return json.load(f)
     return []
 
-def save_featured(featured_products):
-    """Lưu danh sách sản phẩm featured vào file JSON và JS"""
+def write_featured_files(featured_products):
+    """Ghi danh sách featured ra file JSON và JS"""
     # Lưu JSON
     with open(FEATURED_FILE, 'w', encoding='utf-8') as f:
-        json.dump(featured_products, f, ensure_ascii=False, indent=4)
+        write_json_array(f, featured_products)
     
     # Tạo file JS để web có thể load trực tiếp
-    js_content = "// Sản phẩm hiển thị trong Modal quảng cáo - Được tạo tự động bởi product_manager.py\n"
-    js_content += "// Chứa 4 sản phẩm được chọn để hiển thị trong các modal trên trang chủ\n"
-    js_content += "const featuredProducts = " + json.dumps(featured_products, ensure_ascii=False, indent=4) + ";\n"
     with open(FEATURED_JS_FILE, 'w', encoding='utf-8') as f:
-        f.write(js_content)
+        f.write("// Sản phẩm hiển thị trong Modal quảng cáo - Được tạo tự động bởi product_manager.py\n")
+        f.write("// Chứa 4 sản phẩm được chọn để hiển thị trong các modal trên trang chủ\n")
+        f.write("const featuredProducts = ")
+        write_json_array(f, featured_products)
+        f.write(";\n")
 
-def save_products(products):
-    """Lưu danh sách sản phẩm vào file JSON và tạo file JS"""
-    # Lưu JSON
-    with open(PRODUCTS_FILE, 'w', encoding='utf-8') as f:
-        json.dump(products, f, ensure_ascii=False, indent=4)
+@functools.lru_cache(maxsize=4096)
+def qr_svg_data_uri(buy_link):
+    """
+    QR dạng SVG data URI gọn nhẹ: mỗi đoạn module đen liên tiếp trên 1 hàng là 1 nét ngang dày 1 module.
+    Mức sửa lỗi L vì QR chỉ hiển thị trên màn hình (không bị bẩn/rách như bản in) -> ít module hơn.
+    """
+    qr = qrcode.QRCode(error_correction=qrcode.constants.ERROR_CORRECT_L, border=2)
+    qr.add_data(buy_link)
+    qr.make(fit=True)
+    matrix = qr.get_matrix()
+    size = len(matrix)
+    
+    path = []
+    for y, row in enumerate(matrix):
+        x = 0
+        while x < size:
+            if row[x]:
+                start = x
+                while x < size and row[x]:
+                    x += 1
+                path.append(f"M{start},{y}.5h{x - start}")
+            else:
+                x += 1
+    
+    # Chỉ dùng nháy đơn để nhúng an toàn vào thuộc tính src="..." trong HTML
+    svg = (f"<svg xmlns='http://www.w3.org/2000/svg' viewBox='0 0 {size} {size}' shape-rendering='crispEdges'>"
+           f"<rect width='{size}' height='{size}' fill='white'/><path stroke='black' d='{''.join(path)}'/></svg>")
+    return "data:image/svg+xml," + quote(svg, safe="/:=',<>")
+
+def products_for_web(products, inline_qr=True):
+    """Danh sách sản phẩm cho web (QR nhúng inline nếu QR_OUTPUT = 'svg' và inline_qr)"""
+    if not inline_qr or QR_OUTPUT != 'svg' or not QR_AVAILABLE:
+        return products
+    return (dict(p, qrImage=qr_svg_data_uri(p['buyLink'])) if p.get('buyLink') else p for p in products)
+
+def write_products_files(products, inline_qr=True):
+    """
+    Ghi danh sách sản phẩm ra file JSON và JS.
+    inline_qr=False: không nhúng QR SVG vào JS (lưới trong index.html đã render sẵn kèm QR)
+    """
+    # Lưu JSON (ghi từng sản phẩm, không dựng cả chuỗi JSON trong bộ nhớ).
+    # Ghi ra file tạm rồi đổi tên: người đang đọc (không khóa) luôn thấy bản cũ hoặc mới trọn vẹn
+    tmp_path = PRODUCTS_FILE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        write_json_array(f, products)
+    os.replace(tmp_path, PRODUCTS_FILE)
     
     # Tạo file JS để web có thể load trực tiếp
-    js_content = "// Dữ liệu sản phẩm - Được tạo tự động bởi product_manager.py\n"
-    js_content += "const productsData = " + json.dumps(products, ensure_ascii=False, indent=4) + ";\n"
-    with open(PRODUCTS_JS_FILE, 'w', encoding='utf-8') as f:
-        f.write(js_content)
+    tmp_path = PRODUCTS_JS_FILE + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write("// Dữ liệu sản phẩm - Được tạo tự động bởi product_manager.py\n")
+        f.write("const productsData = ")
+        write_json_array(f, products_for_web(products, inline_qr))
+        f.write(";\n")
+    os.replace(tmp_path, PRODUCTS_JS_FILE)
+
+# === Render sẵn lưới sản phẩm vào shop/index.html ===
+# Cùng template với renderProducts() trong index.html, trình duyệt hiển thị ngay từ HTML
+# mà không phải chờ products-data.js; JS chỉ còn xử lý tương tác (xem mô tả).
+
+PRODUCTS_GRID_START = '<!-- PRODUCTS_GRID_START: được tạo tự động bởi product_manager.py -->'
+PRODUCTS_GRID_END = '<!-- PRODUCTS_GRID_END -->'
+BUY_ICON_SVG = (
+    '<svg xmlns="http://www.w3.org/2000/svg" width="16" height="16" viewBox="0 0 24 24" fill="none" '
+    'stroke="currentColor" stroke-width="2" stroke-linecap="round" stroke-linejoin="round" '
+    'style="margin-right: 6px; vertical-align: -2px;"><circle cx="8" cy="21" r="1"/><circle cx="19" cy="21" r="1"/>'
+    '<path d="M2.05 2.05h2l2.66 12.42a2 2 0 0 0 2 1.58h9.78a2 2 0 0 0 1.95-1.57l1.65-7.43H5.12"/></svg>'
+)
+
+def _attr(value):
+    """Escape giá trị thuộc tính HTML đặt trong nháy kép"""
+    return html.escape(value or '', quote=False).replace('"', '&quot;')
+
+def _text(value):
+    return html.escape(value or '', quote=False)
+
+def render_product_card(product):
+    """HTML 1 thẻ sản phẩm (giống template trong renderProducts())"""
+    price_original = f'<span class="price-original">{_text(product["priceOriginal"])}</span>' if product.get('priceOriginal') else ''
+    discount = f'<span class="price-discount">{_text(product["discount"])}</span>' if product.get('discount') else ''
+    qr_section = ''
+    if product.get('qrImage'):
+        qr_section = f"""
+                            <div class="qr-section">
+                                <div class="qr-placeholder">
+                                    <img src="{_attr(product['qrImage'])}" alt="QR {_attr(product['name'])}" loading="lazy">
+                                </div>
+                                <span class="qr-text">Quét mã QR để mua hàng qua điện thoại</span>
+                            </div>"""
+    return f"""
+                <div class="product-card">
+                    <div class="product-image">
+                        <img src="{_attr(product['image'])}" alt="{_attr(product['name'])}" onerror="this.parentElement.innerHTML='<div style=\\'color:#444; font-size: 0.85rem;\\'>Ảnh không tải được</div>'">
+                    </div>
+                    <div class="product-info">
+                        <h3 class="product-name">{_text(product['name'])}</h3>
+                        <span class="product-desc-link" onclick="showDescModal('{_attr(product['id'])}')">
+                            Xem mô tả chi tiết →
+                        </span>
+                        <div class="product-price">
+                            <div class="price-row">
+                                <span class="price-current">{_text(product['priceNow'])}</span>
+                                {price_original}
+                            </div>
+                            {discount}
+                        </div>
+                        <div class="product-actions">
+                            <a href="{_attr(product['buyLink'])}" target="_blank" class="btn">{BUY_ICON_SVG}Mua ngay</a>{qr_section}
+                        </div>
+                    </div>
+                </div>"""
+
+def render_products_grid(products):
+    """HTML toàn bộ lưới sản phẩm (dùng dữ liệu web: QR inline nếu bật)"""
+    cards = ''.join(render_product_card(p) for p in products_for_web(products))
+    return cards or '\n                <p class="loading">Chưa có sản phẩm nào</p>'
+
+def shop_html_prerendered(path=None):
+    """shop/index.html có chỗ chèn lưới render sẵn không (khi đó JS chỉ cần dữ liệu cho modal mô tả)"""
+    path = path or SHOP_HTML_FILE
+    if not os.path.exists(path):
+        return False
+    with open(path, 'r', encoding='utf-8') as f:
+        page = f.read()
+    start = page.find(PRODUCTS_GRID_START)
+    return start >= 0 and page.find(PRODUCTS_GRID_END, start) >= 0
+
+def write_shop_html(products, path=None):
+    """Chèn lưới sản phẩm render sẵn vào giữa 2 marker trong shop/index.html"""
+    path = path or SHOP_HTML_FILE
+    with open(path, 'r', encoding='utf-8') as f:
+        page = f.read()
+    start = page.find(PRODUCTS_GRID_START)
+    end = page.find(PRODUCTS_GRID_END, start)
+    if start < 0 or end < 0:
+        print(f"⚠️ Không tìm thấy marker lưới sản phẩm trong {path}, bỏ qua render sẵn")
+        return False
+    start += len(PRODUCTS_GRID_START)
+    new_page = page[:start] + render_products_grid(products) + '\n                ' + page[end:]
+    if new_page != page:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(new_page)
+    return True
+
+# === Xuất feed sản phẩm cho nền tảng quảng cáo / so sánh giá ===
+# Đọc dần sản phẩm (iter_products) và ghi từng dòng, bộ nhớ không tăng theo số sản phẩm.
+
+FEED_FIELDS = ['id', 'title', 'description', 'link', 'image_link', 'price', 'sale_price', 'availability', 'condition']
+
+def site_base_url():
+    """URL gốc của website lấy từ file CNAME (VD: https://tiembanh4k.com/)"""
+    cname_file = os.path.join(SITE_ROOT, 'CNAME')
+    if os.path.exists(cname_file):
+        with open(cname_file, 'r', encoding='utf-8') as f:
+            domain = f.read().strip()
+        if domain:
+            return f"https://{domain}/"
+    return ''
+
+def feed_item(product, base_url):
+    """Chuyển sản phẩm sang bản ghi feed: giá dạng số, link ảnh tuyệt đối"""
+    price_now = parse_price(product.get('priceNow'))
+    price_original = parse_price(product.get('priceOriginal'))
+    # Ảnh lưu dạng ../aff-data/... (tương đối so với /shop/)
+    image_link = urljoin(urljoin(base_url, 'shop/'), product.get('image', '')) if base_url else product.get('image', '')
+    has_sale = price_original is not None and price_now is not None and price_original > price_now
+    return {
+        "id": product['id'],
+        "title": product['name'],
+        "description": ' '.join(product.get('description') or []) or product['name'],
+        "link": product.get('buyLink', ''),
+        "image_link": image_link,
+        "price": f"{price_original if has_sale else price_now} VND" if price_now is not None else '',
+        "sale_price": f"{price_now} VND" if has_sale else '',
+        "availability": "in stock",
+        "condition": "new",
+    }
+
+def iter_changed_products(products, state):
+    """
+    Chỉ lấy sản phẩm mới/thay đổi so với lần xuất trước, đồng thời cập nhật state {id: fingerprint}.
+    Các id còn lại trong state sau khi duyệt xong là sản phẩm đã bị xóa.
+    """
+    seen = set()
+    for product in products:
+        fingerprint = _fingerprint(product)
+        seen.add(product['id'])
+        if state.get(product['id']) != fingerprint:
+            state[product['id']] = fingerprint
+            yield product
+    for product_id in [pid for pid in state if pid not in seen]:
+        del state[product_id]
+
+def write_feed_csv(f, items):
+    writer = csv.DictWriter(f, fieldnames=FEED_FIELDS)
+    writer.writeheader()
+    count = 0
+    for item in items:
+        writer.writerow(item)
+        count += 1
+    return count
+
+def write_feed_jsonl(f, items):
+    count = 0
+    for item in items:
+        f.write(json.dumps(item, ensure_ascii=False) + "\n")
+        count += 1
+    return count
+
+def write_feed_xml(f, items, base_url=''):
+    """Feed RSS 2.0 theo chuẩn Google Merchant (namespace g:)"""
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    f.write('<rss version="2.0" xmlns:g="http://base.google.com/ns/1.0">\n<channel>\n')
+    f.write(f"<title>Quầy Lưu Niệm - Tiệm Bánh Netflix</title>\n<link>{xml_escape(urljoin(base_url, 'shop/'))}</link>\n")
+    f.write("<description>Sản phẩm Quầy Lưu Niệm</description>\n")
+    count = 0
+    for item in items:
+        f.write("<item>\n")
+        for field in FEED_FIELDS:
+            if item[field]:
+                f.write(f"  <g:{field}>{xml_escape(item[field])}</g:{field}>\n")
+        f.write("</item>\n")
+        count += 1
+    f.write("</channel>\n</rss>\n")
+    return count
+
+FEED_WRITERS = {'csv': write_feed_csv, 'jsonl': write_feed_jsonl, 'xml': write_feed_xml}
+
+def default_feed_path(fmt, incremental=False):
+    """
+    File feed mặc định. Bản incremental ghi ra file riêng (products.delta.<fmt>) để
+    không thay mất feed đầy đủ mà nền tảng quảng cáo đang đọc.
+    """
+    return os.path.join(FEEDS_DIR, f"products.delta.{fmt}" if incremental else f"products.{fmt}")
+
+def removed_feed_item(product_id):
+    """Bản ghi feed cho sản phẩm đã xóa (chỉ có trong feed incremental): báo hết hàng để ngừng quảng cáo"""
+    return dict({field: '' for field in FEED_FIELDS}, id=product_id, availability="out of stock")
+
+def load_feed_state(path):
+    """Tải dấu vân tay sản phẩm {định dạng: {id: fingerprint}}, chưa có file thì trả về {}"""
+    if os.path.exists(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    return {}
+
+def pending_feed_state_file(state_file=None):
+    """File dấu vân tay của các feed vừa xuất nhưng nền tảng chưa lấy (.feed-state.pending.json)"""
+    root, ext = os.path.splitext(state_file or FEED_STATE_FILE)
+    return f"{root}.pending{ext}"
+
+def export_feed(fmt, output_path, incremental=False, base_url=None, state_file=None):
+    """
+    Xuất feed ra file. incremental=True: chỉ xuất sản phẩm thay đổi và sản phẩm đã xóa (dạng hết hàng)
+    kể từ lần xuất đã được nền tảng lấy (xem commit_feed). Xuất lại nhiều lần trước khi commit
+    thì feed incremental vẫn gồm mọi thay đổi từ lần đó, không mất thay đổi của lần xuất trước.
+    Trả về (số sản phẩm đã xuất, số sản phẩm đã bị xóa).
+    """
+    base_url = site_base_url() if base_url is None else base_url
+    state_file = state_file or FEED_STATE_FILE
+    delivered = load_feed_state(state_file).get(fmt, {})
+    # Xuất tất cả thì bắt đầu từ rỗng nhưng vẫn ghi lại dấu vân tay cho lần xuất incremental sau
+    state = dict(delivered) if incremental else {}
+    items = (feed_item(p, base_url) for p in iter_changed_products(iter_products(), state))
+    removed = []
+    
+    def removed_items():
+        # Chạy sau khi đã duyệt hết sản phẩm: id còn trong delivered mà không còn trong state là đã xóa
+        removed.extend(sorted(set(delivered) - set(state)))
+        if incremental:
+            yield from (removed_feed_item(product_id) for product_id in removed)
+    
+    os.makedirs(os.path.dirname(os.path.abspath(output_path)), exist_ok=True)
+    tmp_path = output_path + '.tmp'
+    with open(tmp_path, 'w', encoding='utf-8', newline='') as f:
+        if fmt == 'xml':
+            count = write_feed_xml(f, itertools.chain(items, removed_items()), base_url)
+        else:
+            count = FEED_WRITERS[fmt](f, itertools.chain(items, removed_items()))
+    os.replace(tmp_path, output_path)
+    
+    pending_file = pending_feed_state_file(state_file)
+    pending = load_feed_state(pending_file)
+    pending[fmt] = state
+    with open(pending_file, 'w', encoding='utf-8') as f:
+        json.dump(pending, f)
+    return count - (len(removed) if incremental else 0), len(removed)
+
+def commit_feed(fmt=None, state_file=None):
+    """
+    Ghi nhận feed vừa xuất đã được nền tảng lấy: lần xuất incremental sau chỉ gồm thay đổi
+    kể từ lần xuất này. fmt=None: mọi định dạng đang chờ. Trả về danh sách định dạng đã ghi nhận.
+    """
+    state_file = state_file or FEED_STATE_FILE
+    pending_file = pending_feed_state_file(state_file)
+    pending = load_feed_state(pending_file)
+    committed = sorted(pending) if fmt is None else [fmt] if fmt in pending else []
+    if not committed:
+        return []
+    delivered = load_feed_state(state_file)
+    for name in committed:
+        delivered[name] = pending.pop(name)
+    with open(state_file, 'w', encoding='utf-8') as f:
+        json.dump(delivered, f)
+    if pending:
+        with open(pending_file, 'w', encoding='utf-8') as f:
+            json.dump(pending, f)
+    else:
+        os.remove(pending_file)
+    return committed
+
+# === Build graph: file build ra -> đầu vào (sản phẩm + trường) ===
+#   qr:<id>    aff-data/<id>_qr.webp         <- buyLink của sản phẩm <id> (chỉ khi QR_OUTPUT = 'webp')
+#   products   products.json, products-data.js <- toàn bộ danh sách + QR_OUTPUT (sau khi QR cập nhật qrImage)
+#   shop-html  shop/index.html (lưới render sẵn) <- giống products
+#   featured   featured-products.json/.js     <- id trong featured + FEATURED_FIELDS của các sản phẩm đó
+# Mỗi node lưu dấu vân tay đầu vào + chữ ký file đầu ra; chỉ build lại node có thay đổi.
+
+FEATURED_FIELDS = ('id', 'name', 'image', 'priceNow', 'priceOriginal', 'buyLink')
+
+def _fingerprint(value, items=()):
+    """
+    Dấu vân tay (sha1) của dữ liệu đầu vào. Danh sách dài (cả catalog) truyền qua items:
+    băm từng phần tử một, không dựng chuỗi JSON của cả danh sách trong bộ nhớ.
+    """
+    digest = hashlib.sha1(json.dumps(value, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+    for item in items:
+        digest.update(b'\n')
+        digest.update(json.dumps(item, ensure_ascii=False, sort_keys=True).encode('utf-8'))
+    return digest.hexdigest()
+
+def _output_signatures(paths):
+    return [list(get_file_signature(path) or []) for path in paths]
+
+def load_build_state():
+    """Tải trạng thái build lần trước {node: {"input": ..., "outputs": [...]}}"""
+    if os.path.exists(BUILD_STATE_FILE):
+        try:
+            with open(BUILD_STATE_FILE, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+def save_build_state(state):
+    with open(BUILD_STATE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=1, sort_keys=True)
+
+def generate_qr_image(product_id, buy_link):
+    """Tạo QR (webp) từ link mua hàng, trả về đường dẫn tương đối dùng trong JSON"""
+    os.makedirs(AFF_DATA_DIR, exist_ok=True)
+    qr = qrcode.QRCode(version=1, box_size=10, border=2)
+    qr.add_data(buy_link)
+    qr.make(fit=True)
+    qr_img = qr.make_image(fill_color="black", back_color="white")
+    
+    # Lưu dưới dạng webp
+    qr_filename = f"{product_id}_qr.webp"
+    qr_img.save(os.path.join(AFF_DATA_DIR, qr_filename), 'WEBP', quality=90)
+    return f"../aff-data/{qr_filename}"
+
+def sync_featured(featured, products):
+    """Làm mới bản sao trong featured từ sản phẩm gốc, bỏ sản phẩm đã bị xóa"""
+    products_by_id = {p['id']: p for p in products}
+    return [make_featured_entry(products_by_id[f['id']]) for f in featured if f.get('id') in products_by_id]
+
+def build_outputs(products, featured, force=False):
+    """
+    Build lại đúng các file có đầu vào thay đổi (hoặc file bị sửa/xóa từ bên ngoài).
+    Trả về (danh sách node đã build, featured đã làm mới).
+    """
+    state = load_build_state()
+    new_state = {}
+    rebuilt = []
+    
+    def is_dirty(node, fingerprint, paths):
+        previous = state.get(node)
+        return force or previous is None or previous['input'] != fingerprint \
+            or previous['outputs'] != _output_signatures(paths)
+    
+    # 1. QR theo từng sản phẩm (chạy trước vì cập nhật trường qrImage)
+    for product in products:
+        node = f"qr:{product['id']}"
+        qr_file = os.path.join(AFF_DATA_DIR, f"{product['id']}_qr.webp")
+        fingerprint = _fingerprint(product.get('buyLink', ''))
+        if not QR_AVAILABLE or QR_OUTPUT != 'webp' or not product.get('buyLink'):
+            if node in state:
+                new_state[node] = state[node]  # Giữ lại để phát hiện thay đổi khi có thư viện QR
+            continue
+        # QR có sẵn nhưng chưa từng được theo dõi: coi như đã build, không tạo lại
+        if node not in state and not force and product.get('qrImage') and os.path.exists(qr_file):
+            new_state[node] = {"input": fingerprint, "outputs": _output_signatures([qr_file])}
+            continue
+        if is_dirty(node, fingerprint, [qr_file]) or not product.get('qrImage'):
+            try:
+                product['qrImage'] = generate_qr_image(product['id'], product['buyLink'])
+                rebuilt.append(node)
+            except Exception as e:
+                print(f"Lỗi tạo QR: {e}")
+                continue
+        new_state[node] = {"input": fingerprint, "outputs": _output_signatures([qr_file])}
+    
+    # 2. products.json + products-data.js
+    # Lưới đã render sẵn kèm QR thì products-data.js không nhúng QR lần nữa
+    products_paths = [PRODUCTS_FILE, PRODUCTS_JS_FILE]
+    prerendered = shop_html_prerendered()
+    fingerprint = _fingerprint([QR_OUTPUT if QR_AVAILABLE else None, prerendered], products)
+    if is_dirty('products', fingerprint, products_paths):
+        write_products_files(products, inline_qr=not prerendered)
+        rebuilt.append('products')
+    new_state['products'] = {"input": fingerprint, "outputs": _output_signatures(products_paths)}
+    
+    # 3. Lưới sản phẩm render sẵn trong shop/index.html (cùng đầu vào với products-data.js)
+    if os.path.exists(SHOP_HTML_FILE):
+        if is_dirty('shop-html', fingerprint, [SHOP_HTML_FILE]):
+            write_shop_html(products)
+            rebuilt.append('shop-html')
+        new_state['shop-html'] = {"input": fingerprint, "outputs": _output_signatures([SHOP_HTML_FILE])}
+    
+    # 4. featured-products.json/.js (chỉ phụ thuộc các trường hiển thị của sản phẩm featured)
+    featured = sync_featured(featured, products)
+    featured_paths = [FEATURED_FILE, FEATURED_JS_FILE]
+    fingerprint = _fingerprint(featured)
+    if is_dirty('featured', fingerprint, featured_paths):
+        write_featured_files(featured)
+        rebuilt.append('featured')
+    new_state['featured'] = {"input": fingerprint, "outputs": _output_signatures(featured_paths)}
+    
+    save_build_state(new_state)
+    return rebuilt, featured
+
+# === Nhiều người cùng sửa: khóa ghi + kiểm tra phiên bản (optimistic) ===
+# Đọc không cần khóa (file được ghi bằng cách đổi tên nên luôn trọn vẹn). Người ghi giữ khóa
+# advisory chỉ trong lúc ghi, và chỉ ghi nếu phiên bản trên đĩa vẫn là phiên bản mình đã đọc;
+# nếu không thì gộp thay đổi của người kia vào rồi ghi lại (xem ProductManagerApp.save_catalog).
+
+class CatalogConflictError(Exception):
+    """Nguồn dữ liệu đã được ghi bởi người khác kể từ lần đọc cuối"""
+    
+    def __init__(self, expected, actual):
+        super().__init__(f"Dữ liệu sản phẩm đã thay đổi (phiên bản {expected} → {actual})")
+        self.expected = expected
+        self.actual = actual
+
+class CatalogLockError(Exception):
+    """Không lấy được khóa ghi (người khác ghi quá lâu)"""
+
+@contextlib.contextmanager
+def catalog_write_lock(timeout=CATALOG_LOCK_TIMEOUT, lock_file=None):
+    """Giữ khóa ghi độc quyền giữa các tiến trình trong khối `with`"""
+    deadline = time.monotonic() + timeout
+    with open(lock_file or CATALOG_LOCK_FILE, 'a+b') as f:
+        while True:
+            try:
+                if fcntl:
+                    fcntl.flock(f, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                else:
+                    f.seek(0)
+                    msvcrt.locking(f.fileno(), msvcrt.LK_NBLCK, 1)
+                break
+            except OSError:
+                if time.monotonic() >= deadline:
+                    raise CatalogLockError(f"Người khác đang ghi dữ liệu sản phẩm quá {timeout} giây")
+                time.sleep(0.05)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f, fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+def file_version(path):
+    """Hash nội dung file làm phiên bản ('' nếu chưa có file) - bắt được cả khi sửa tay"""
+    digest = hashlib.sha1()
+    try:
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+    except FileNotFoundError:
+        return ''
+    return digest.hexdigest()
+
+def catalog_version():
+    """Phiên bản hiện tại của danh sách sản phẩm: bộ đếm trong catalog.db, hoặc hash của products.json"""
+    store = get_catalog_store()
+    if store:
+        return store.get_version()
+    return file_version(PRODUCTS_FILE)
+
+def _check_version(expected_version):
+    """Gọi khi đang giữ khóa ghi: báo CatalogConflictError nếu trên đĩa không còn là phiên bản đã đọc"""
+    if expected_version is not None:
+        current = catalog_version()
+        if current != expected_version:
+            raise CatalogConflictError(expected_version, current)
+
+def save_catalog_data(products=None, featured=None, force=False, expected_version=None, build=True):
+    """
+    Lưu sản phẩm và/hoặc featured vào nguồn dữ liệu rồi build lại các file liên quan.
+    expected_version: phiên bản lúc đọc; nếu trên đĩa đã khác thì báo CatalogConflictError, không ghi gì.
+    build=False (chỉ có tác dụng khi dùng SQLite): chỉ ghi catalog.db, file web được build sau
+    (lệnh build hoặc bước build hẹn giờ trong app).
+    Trả về (các file đã build lại, phiên bản mới).
+    """
+    with catalog_write_lock():
+        _check_version(expected_version)
+        
+        store = get_catalog_store()
+        if products is None:
+            products = load_products()
+        elif store:
+            store.save_products(products)
+            if not build:
+                return [], catalog_version()
+        if featured is None:
+            featured = load_featured()
+        
+        rebuilt, synced_featured = build_outputs(products, featured, force)
+        if store:
+            if 'products' in rebuilt:
+                store.save_products(products)  # qrImage có thể vừa được cập nhật
+            if synced_featured != featured or 'featured' in rebuilt:
+                store.save_featured(synced_featured)
+        return rebuilt, catalog_version()
+
+def save_featured(featured_products):
+    """Lưu danh sách sản phẩm featured (vào SQLite nếu có) và tạo file JSON + JS"""
+    save_catalog_data(featured=featured_products)
+
+def save_products(products, expected_version=None, build=True):
+    """Lưu danh sách sản phẩm (vào SQLite nếu có) và tạo lại các file bị ảnh hưởng, trả về phiên bản mới"""
+    return save_catalog_data(products=products, expected_version=expected_version, build=build)[1]
+
+def save_product_rows(products, expected_version=None):
+    """
+    SQLite: chỉ ghi lại các sản phẩm đã sửa (không đổi vị trí), mỗi sản phẩm 1 dòng,
+    không build lại file web. Trả về phiên bản mới.
+    """
+    with catalog_write_lock():
+        _check_version(expected_version)
+        store = get_catalog_store()
+        store.update_products(products)
+        return store.get_version()
+
+def build_catalog_outputs(force=True):
+    """Tạo lại các file JSON/JS/QR từ nguồn dữ liệu chính"""
+    return save_catalog_data(force=force)[0]
+
+def import_catalog_to_db(db_path=None):
+    """Chuyển products.json + featured-products.json vào SQLite, trả về số sản phẩm"""
+    with open(PRODUCTS_FILE, 'r', encoding='utf-8') as f:
+        products = json.load(f)
+    featured = []
+    if os.path.exists(FEATURED_FILE):
+        with open(FEATURED_FILE, 'r', encoding='utf-8') as f:
+            featured = json.load(f)
+    store = CatalogStore(db_path)
+    try:
+        store.save_products(products)
+        store.save_featured(featured)
+    finally:
+        store.close()
+    return len(products)
+
+def get_file_signature(path):
+    """Chữ ký (mtime_ns, size) của file để phát hiện thay đổi, None nếu chưa có file"""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+def _longest_increasing(values):
+    """Chỉ số của 1 dãy con tăng dài nhất trong values (O(n log n))"""
+    tails, tail_index, previous = [], [], [None] * len(values)
+    for i, value in enumerate(values):
+        pos = bisect.bisect_left(tails, value)
+        if pos == len(tails):
+            tails.append(value)
+            tail_index.append(i)
+        else:
+            tails[pos] = value
+            tail_index[pos] = i
+        previous[i] = tail_index[pos - 1] if pos else None
+    result = []
+    i = tail_index[-1] if tail_index else None
+    while i is not None:
+        result.append(i)
+        i = previous[i]
+    return result[::-1]
+
+def _moved_ids(base_ids, side_ids):
+    """id mà 1 phía đã di chuyển hoặc thêm mới so với base (số id bị coi là di chuyển ít nhất có thể)"""
+    base_pos = {pid: i for i, pid in enumerate(base_ids)}
+    common = [pid for pid in side_ids if pid in base_pos]
+    stable = {common[i] for i in _longest_increasing([base_pos[pid] for pid in common])}
+    return {pid for pid in side_ids if pid not in stable}
+
+def merge_order(base_ids, local_ids, remote_ids, keep_ids):
+    """
+    Gộp thứ tự 3 chiều theo id: giữ các id không phía nào di chuyển theo thứ tự gốc,
+    rồi đặt các id mỗi phía đã di chuyển/thêm mới ngay sau id đứng trước nó ở phía đó.
+    Cả 2 phía cùng di chuyển 1 id thì theo bản trên đĩa. Chỉ giữ các id trong keep_ids.
+    """
+    moved_remote = _moved_ids(base_ids, remote_ids)
+    moved_local = _moved_ids(base_ids, local_ids)
+    order = [pid for pid in base_ids if pid in keep_ids and pid not in moved_remote and pid not in moved_local]
+    placed = set(order)
+    remote_placed = set()  # Cùng chèn sau 1 id thì id của bản trên đĩa đứng trước
+    for side_ids, moved in ((remote_ids, moved_remote), (local_ids, moved_local)):
+        prev = None
+        for pid in side_ids:
+            if pid in moved and pid in keep_ids and pid not in placed:
+                index = order.index(prev) + 1 if prev is not None else 0
+                if side_ids is local_ids:
+                    while index < len(order) and order[index] in remote_placed:
+                        index += 1
+                else:
+                    remote_placed.add(pid)
+                order.insert(index, pid)
+                placed.add(pid)
+            if pid in placed:
+                prev = pid
+    order.extend(pid for pid in keep_ids if pid not in placed)
+    return order
+
+def merge_products(base, local, remote, prefer=None):
+    """
+    Gộp 3 chiều theo id sản phẩm:
+      base   - bản đã đọc/ghi lần cuối
+      local  - bản đang sửa trong app
+      remote - bản hiện tại trên đĩa (do script/người khác sửa)
+    Sản phẩm chỉ đổi ở 1 phía thì lấy phía đó; đổi ở cả 2 phía (khác nhau, kể cả 1 bên xóa
+    còn bên kia sửa) là xung đột. Thứ tự được gộp theo id (xem merge_order).
+    prefer: None / 'local' / 'remote' - cách giải quyết xung đột.
+    Trả về (danh sách đã gộp, danh sách id xung đột). Object không đổi được giữ nguyên.
+    """
+    base_map = {p['id']: p for p in base}
+    local_map = {p['id']: p for p in local}
+    remote_map = {p['id']: p for p in remote}
+    
+    base_ids = [p['id'] for p in base]
+    local_ids = [p['id'] for p in local]
+    remote_ids = [p['id'] for p in remote]
+    
+    chosen_map, conflicts = {}, []
+    for pid in dict.fromkeys(base_ids + remote_ids + local_ids):
+        b, l, r = base_map.get(pid), local_map.get(pid), remote_map.get(pid)
+        if l == r:
+            chosen = l
+        elif l == b:
+            chosen = r
+        elif r == b:
+            chosen = l
+        else:
+            conflicts.append(pid)
+            chosen = r if prefer == 'remote' else l if prefer == 'local' else (l if l is not None else r)
+        if chosen is not None:
+            chosen_map[pid] = chosen
+    
+    order = merge_order(base_ids, local_ids, remote_ids, chosen_map)
+    return [chosen_map[pid] for pid in order], conflicts
+
+# === Hoàn tác / làm lại ===
+# Mỗi thao tác được lưu dưới dạng các phép biến đổi nhỏ có thể đảo ngược, giữ tham chiếu
+# tới object sản phẩm (không chụp lại cả danh sách):
+#   ('move', from_index, to_index)
+#   ('insert', index, product)      ('delete', index, product)
+#   ('replace', index, old, new)    ('permute', order)
+
+def invert_catalog_op(op):
+    """Phép biến đổi ngược"""
+    kind = op[0]
+    if kind == 'move':
+        return ('move', op[2], op[1])
+    if kind == 'insert':
+        return ('delete', op[1], op[2])
+    if kind == 'delete':
+        return ('insert', op[1], op[2])
+    if kind == 'replace':
+        return ('replace', op[1], op[3], op[2])
+    if kind == 'permute':
+        inverse = [0] * len(op[1])
+        for new_index, old_index in enumerate(op[1]):
+            inverse[old_index] = new_index
+        return ('permute', inverse)
+    raise ValueError(f"Không hỗ trợ thao tác '{kind}'")
+
+def apply_catalog_op(products, op):
+    """Áp dụng 1 phép biến đổi lên danh sách (sửa trực tiếp)"""
+    kind = op[0]
+    if kind == 'move':
+        products.insert(op[2], products.pop(op[1]))
+    elif kind == 'insert':
+        products.insert(op[1], op[2])
+    elif kind == 'delete':
+        del products[op[1]]
+    elif kind == 'replace':
+        products[op[1]] = op[3]
+    elif kind == 'permute':
+        products[:] = apply_permutation(products, op[1])
+    else:
+        raise ValueError(f"Không hỗ trợ thao tác '{kind}'")
+
+class CatalogHistory:
+    """Ngăn xếp hoàn tác/làm lại có giới hạn, mỗi mục là (nhãn, danh sách phép biến đổi)"""
+    
+    def __init__(self, depth=UNDO_DEPTH, on_discard=None):
+        self.undo_stack = deque()
+        self.redo_stack = []
+        self.depth = depth
+        # Gọi với các phép biến đổi đang có hiệu lực khi chúng không thể hoàn tác/làm lại được nữa
+        # (vd. để dọn ảnh của sản phẩm đã xóa hoặc ảnh cũ đã bị thay)
+        self.on_discard = on_discard
+    
+    def record(self, label, ops):
+        """Áp dụng xong thì ghi lại thao tác; thao tác mới xóa nhánh làm lại"""
+        self.undo_stack.append((label, ops))
+        self._discard_redo()
+        if len(self.undo_stack) > self.depth:
+            self._discard(self.undo_stack.popleft())
+    
+    def undo(self, products):
+        """Hoàn tác thao tác gần nhất, trả về nhãn (None nếu không còn gì)"""
+        if not self.undo_stack:
+            return None
+        label, ops = self.undo_stack.pop()
+        for op in reversed(ops):
+            apply_catalog_op(products, invert_catalog_op(op))
+        self.redo_stack.append((label, ops))
+        return label
+    
+    def redo(self, products):
+        """Làm lại thao tác vừa hoàn tác, trả về nhãn (None nếu không còn gì)"""
+        if not self.redo_stack:
+            return None
+        label, ops = self.redo_stack.pop()
+        for op in ops:
+            apply_catalog_op(products, op)
+        self.undo_stack.append((label, ops))
+        return label
+    
+    def clear(self):
+        """Xóa lịch sử (vd. khi dữ liệu bị thay đổi từ bên ngoài)"""
+        while self.undo_stack:
+            self._discard(self.undo_stack.popleft())
+        self._discard_redo()
+    
+    def _discard(self, entry):
+        if self.on_discard:
+            self.on_discard(entry[1])
+    
+    def _discard_redo(self):
+        """Nhánh làm lại bị bỏ: các thao tác này đang ở trạng thái đã hoàn tác nên báo phép ngược của chúng"""
+        while self.redo_stack:
+            label, ops = self.redo_stack.pop()
+            self._discard((label, [invert_catalog_op(op) for op in reversed(ops)]))
+
+class ProductsFileWatcher:
+    """Theo dõi nguồn dữ liệu sản phẩm (theo mtime) để phát hiện chỉnh sửa từ bên ngoài"""
+    
+    def __init__(self, path=None):
+        self.path = path or catalog_source_file()
+        self.signature = None
+        self.version = None  # Phiên bản của bản gốc, kiểm tra lại trước mỗi lần ghi
+        self.base = []  # Bản đã đọc/ghi lần cuối, dùng làm gốc khi gộp
+    
+    def read(self):
+        """Đọc nội dung hiện tại trên đĩa, trả về (danh sách, phiên bản); chưa có file thì (None, '')"""
+        if self.path == CATALOG_DB_FILE:
+            # Lấy phiên bản trước khi đọc: có người ghi xen vào thì lần lưu sau chỉ bị gộp lại, không mất dữ liệu
+            version = catalog_version()
+            return load_products(), version
+        try:
+            with open(self.path, 'rb') as f:
+                data = f.read()
+        except FileNotFoundError:
+            return None, ''
+        return json.loads(data), hashlib.sha1(data).hexdigest()
+    
+    def load(self):
+        """Đọc file và ghi nhận làm bản gốc, trả về bản sao để app chỉnh sửa"""
+        self.signature = get_file_signature(self.path)
+        products, self.version = self.read()
+        self.base = products or []
+        return copy.deepcopy(self.base)
+    
+    def changed(self):
+        """File trên đĩa có khác lần đọc/ghi cuối không"""
+        return get_file_signature(self.path) != self.signature
+    
+    def sync(self, local, prefer=None, force=False):
+        """
+        Gộp thay đổi trên đĩa vào bản local (chỉ khi file đổi, hoặc luôn đọc lại nếu force).
+        Trả về (danh sách đã gộp, id xung đột); file không đổi thì trả về (local, []).
+        """
+        if not force and not self.changed():
+            return local, []
+        signature = get_file_signature(self.path)
+        remote, version = self.read()
+        if remote is None:
+            # File tạm thời biến mất (git checkout, công cụ khác xóa rồi tạo lại): không phải catalog rỗng.
+            # Giữ nguyên bản local và bản gốc; lần lưu tới sẽ tạo lại file, file xuất hiện lại thì gộp như thường
+            self.signature = signature
+            self.version = version
+            return local, []
+        merged, conflicts = merge_products(self.base, local, remote, prefer)
+        if not conflicts or prefer:
+            # Bản trên đĩa đã được gộp vào, lấy làm gốc mới (bản sao riêng để app sửa không ảnh hưởng)
+            self.base = copy.deepcopy(remote)
+            self.signature = signature
+            self.version = version
+        return merged, conflicts
+    
+    def mark_loaded(self, products, signature, version):
+        """
+        Ghi nhận bản vừa tải dần xong; signature và phiên bản lấy lúc bắt đầu tải
+        để không bỏ sót sửa đổi trong lúc tải
+        """
+        self.base = copy.deepcopy(products)
+        self.signature = signature
+        self.version = version
+    
+    def mark_saved(self, products, version, indices=None):
+        """
+        Ghi nhận bản vừa ghi ra đĩa (phiên bản do save_products trả về) làm bản gốc mới.
+        indices: chỉ các vị trí vừa sửa (danh sách không đổi độ dài/thứ tự), khỏi sao chép lại cả danh sách.
+        """
+        if indices is None:
+            self.base = copy.deepcopy(products)
+        else:
+            for i in indices:
+                self.base[i] = copy.deepcopy(products[i])
+        self.signature = get_file_signature(self.path)
+        self.version = version
 
 def generate_id(name):
     """Tạo ID từ tên sản phẩm"""
@@ -85,19 +1161,571 @@ def generate_id(name):
     id_str = re.sub(r'_+', '_', id_str).strip('_')
     return id_str
 
+def parse_price(price_str):
+    """Chuyển giá dạng '462.000đ' thành số nguyên (462000), không hợp lệ trả về None"""
+    digits = re.sub(r'[^0-9]', '', price_str or '')
+    return int(digits) if digits else None
+
+def parse_discount(discount_str):
+    """Chuyển phần trăm giảm dạng '-23%' thành số nguyên dương (23), không có trả về 0"""
+    match = re.search(r'(\d+)', discount_str or '')
+    return int(match.group(1)) if match else 0
+
+def _missing_last(value, descending=False):
+    """
+    Khóa sắp xếp đưa giá trị None (giá không hợp lệ) xuống cuối.
+    Khi giảm dần (sort với reverse=True) cờ None được đảo để vẫn nằm cuối.
+    """
+    missing = value is None
+    return (missing != descending, 0 if missing else value)
+
+# Các trường có thể sắp xếp: tên trường -> hàm tính giá trị từ sản phẩm (None = không hợp lệ)
+SORT_FIELDS = {
+    'price': lambda p: parse_price(p.get('priceNow')),
+    'priceOriginal': lambda p: parse_price(p.get('priceOriginal')),
+    'discount': lambda p: parse_discount(p.get('discount')),
+    'name': lambda p: generate_id(p.get('name', '')),
+}
+
+# Các chế độ xem sắp xếp trong GUI: nhãn -> danh sách (field, descending)
+SORT_VIEWS = [
+    ("Thứ tự đã lưu", []),
+    ("Giá tăng dần", [('price', False), ('name', False)]),
+    ("Giá giảm dần", [('price', True), ('name', False)]),
+    ("Giảm giá nhiều nhất", [('discount', True), ('price', False)]),
+    ("Tên A-Z", [('name', False)]),
+]
+
+def build_sort_keys(products, fields=None):
+    """Tính trước khóa sắp xếp cho từng sản phẩm (chỉ các trường cần dùng, mỗi trường 1 lần)"""
+    fields = list(fields or SORT_FIELDS)
+    return [{field: SORT_FIELDS[field](p) for field in fields} for p in products]
+
+def sorted_view(products, sort_by, sort_keys=None):
+    """
+    Trả về thứ tự chỉ số sản phẩm đã sắp xếp, KHÔNG thay đổi danh sách gốc.
+    sort_by: danh sách (field, descending), trường đầu tiên là ưu tiên cao nhất.
+    Sắp xếp ổn định: các sản phẩm bằng nhau giữ nguyên thứ tự đã lưu.
+    """
+    for field, _ in sort_by:
+        if field not in SORT_FIELDS:
+            raise ValueError(f"Không hỗ trợ sắp xếp theo '{field}'")
+    if sort_keys is None:
+        sort_keys = build_sort_keys(products, [field for field, _ in sort_by])
+    order = list(range(len(products)))
+    # Sắp xếp từ khóa phụ đến khóa chính, nhờ tính ổn định của sort()
+    for field, descending in reversed(sort_by):
+        order.sort(key=lambda i: _missing_last(sort_keys[i][field], descending), reverse=descending)
+    return order
+
+def apply_permutation(products, order):
+    """Áp dụng một hoán vị chỉ số lên danh sách trong 1 lượt, trả về danh sách mới"""
+    if sorted(order) != list(range(len(products))):
+        raise ValueError("Thứ tự mới phải là hoán vị của toàn bộ danh sách sản phẩm")
+    return [products[i] for i in order]
+
+def move_order(count, indices, target_index):
+    """
+    Hoán vị đưa cả nhóm chỉ số (giữ thứ tự tương đối) về target_index,
+    dùng với apply_permutation.
+    """
+    selected = set(indices)
+    block = [i for i in range(count) if i in selected]
+    rest = [i for i in range(count) if i not in selected]
+    target_index = max(0, min(target_index, len(rest)))
+    return rest[:target_index] + block + rest[target_index:]
+
+def product_asset_paths(products):
+    """Danh sách đường dẫn ảnh + QR (không trùng lặp) của các sản phẩm"""
+    paths = {}
+    for product in products:
+        for key in ('image', 'qrImage'):
+            if product.get(key):
+                path = os.path.normpath(os.path.join(SCRIPT_DIR, '..', product[key].replace('../', '')))
+                paths[path] = True
+    return list(paths)
+
+def delete_product_assets(products, keep=()):
+    """Xóa ảnh + QR của nhiều sản phẩm cùng lúc (trừ file còn được `keep` dùng), trả về số file đã xóa"""
+    deleted = 0
+    in_use = set(product_asset_paths(keep))
+    for path in product_asset_paths(products):
+        if path in in_use:
+            continue
+        try:
+            if os.path.exists(path):
+                os.remove(path)
+                deleted += 1
+        except Exception as e:
+            print(f"Lỗi xóa ảnh {path}: {e}")
+    return deleted
+
+def make_featured_entry(product):
+    """Tạo object featured từ sản phẩm (chỉ lấy các trường cần thiết)"""
+    return {
+        "id": product['id'],
+        "name": product['name'],
+        "image": product['image'].replace('../', ''),  # Chuyển từ ../aff-data/ sang aff-data/
+        "priceNow": product['priceNow'],
+        "priceOriginal": product.get('priceOriginal', ''),
+        "buyLink": product['buyLink']
+    }
+
+def add_products_to_featured(featured, products):
+    """
+    Thêm nhiều sản phẩm vào featured (tối đa FEATURED_SLOTS).
+    Trả về (featured mới, đã thêm, đã có sẵn, bị bỏ qua do hết slot).
+    """
+    new_featured = list(featured)
+    featured_ids = {p.get('id') for p in featured}
+    added, existing, overflow = [], [], []
+    for product in products:
+        if product['id'] in featured_ids:
+            existing.append(product)
+        elif len(new_featured) >= FEATURED_SLOTS:
+            overflow.append(product)
+        else:
+            new_featured.append(make_featured_entry(product))
+            featured_ids.add(product['id'])
+            added.append(product)
+    return new_featured, added, existing, overflow
+
+# === Kiểm tra link mua hàng ===
+
+_link_check_local = threading.local()
+
+def _get_connection(scheme, netloc, timeout):
+    """Lấy kết nối HTTP dùng lại (keep-alive) theo host, mỗi thread 1 pool riêng"""
+    pool = getattr(_link_check_local, 'pool', None)
+    if pool is None:
+        pool = _link_check_local.pool = {}
+    key = (scheme, netloc)
+    if key not in pool:
+        conn_class = http.client.HTTPSConnection if scheme == 'https' else http.client.HTTPConnection
+        pool[key] = conn_class(netloc, timeout=timeout)
+    return pool[key]
+
+def _drop_connection(scheme, netloc):
+    """Đóng kết nối hỏng để lần sau mở lại"""
+    pool = getattr(_link_check_local, 'pool', {})
+    conn = pool.pop((scheme, netloc), None)
+    if conn is not None:
+        conn.close()
+
+def _request(method, url, timeout):
+    """
+    Gửi 1 request (không tự theo redirect), thử lại 1 lần nếu kết nối keep-alive đã bị đóng.
+    Trả về (response, body) - body đã được đọc hết để dùng lại kết nối.
+    """
+    parts = urlsplit(url)
+    path = parts.path or '/'
+    if parts.query:
+        path += '?' + parts.query
+    for attempt in range(2):
+        conn = _get_connection(parts.scheme, parts.netloc, timeout)
+        try:
+            conn.request(method, path, headers={'User-Agent': 'TiemBanhLinkChecker/1.0'})
+            resp = conn.getresponse()
+            return resp, resp.read()
+        except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+            _drop_connection(parts.scheme, parts.netloc)
+            if attempt:
+                raise
+        except Exception:
+            _drop_connection(parts.scheme, parts.netloc)
+            raise
+
+def check_link(url, timeout=10, max_redirects=5):
+    """
+    Kiểm tra 1 link: theo redirect thủ công, ghi lại chuỗi redirect và độ trễ.
+    Dùng HEAD, nếu server không hỗ trợ thì chuyển sang GET.
+    """
+    result = {
+        "url": url, "ok": False, "status": None, "finalUrl": url,
+        "redirects": [], "latencyMs": None, "error": None, "checkedAt": time.time()
+    }
+    start = time.perf_counter()
+    current = url
+    try:
+        if urlsplit(url).scheme not in ('http', 'https'):
+            raise ValueError("Link không hợp lệ")
+        for _ in range(max_redirects + 1):
+            resp, _ = _request('HEAD', current, timeout)
+            if resp.status in (405, 501):
+                resp, _ = _request('GET', current, timeout)
+            status, location = resp.status, resp.getheader('Location')
+            result["status"] = status
+            if status in (301, 302, 303, 307, 308) and location:
+                current = urljoin(current, location)
+                result["redirects"].append(current)
+                continue
+            break
+        else:
+            raise ValueError(f"Quá {max_redirects} lần redirect")
+        result["finalUrl"] = current
+        result["ok"] = result["status"] is not None and result["status"] < 400
+    except Exception as e:
+        result["error"] = str(e) or e.__class__.__name__
+    result["latencyMs"] = round((time.perf_counter() - start) * 1000, 1)
+    return result
+
+async def check_links_async(urls, concurrency=8, timeout=10):
+    """Kiểm tra nhiều link song song, tối đa `concurrency` request cùng lúc"""
+    loop = asyncio.get_running_loop()
+    semaphore = asyncio.Semaphore(concurrency)
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        async def run(url):
+            async with semaphore:
+                return await loop.run_in_executor(executor, check_link, url, timeout)
+        return await asyncio.gather(*(run(url) for url in urls))
+
+def load_link_cache(cache_file=None):
+    """Tải cache kết quả kiểm tra link {url: result}"""
+    cache_file = cache_file or LINK_CHECK_CACHE_FILE
+    if os.path.exists(cache_file):
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            pass
+    return {}
+
+def save_link_cache(cache, cache_file=None):
+    """Lưu cache kết quả kiểm tra link"""
+    with open(cache_file or LINK_CHECK_CACHE_FILE, 'w', encoding='utf-8') as f:
+        json.dump(cache, f, ensure_ascii=False, indent=2)
+
+def check_product_links(products, concurrency=8, timeout=10, ttl=LINK_CHECK_TTL, cache_file=None, use_cache=True):
+    """
+    Kiểm tra buyLink của toàn bộ sản phẩm (mỗi URL 1 lần), dùng cache còn hạn.
+    Trả về danh sách {"id", "name", "result"} theo thứ tự sản phẩm.
+    """
+    cache = load_link_cache(cache_file) if use_cache else {}
+    now = time.time()
+    urls = list(dict.fromkeys(p.get('buyLink', '') for p in products))
+    stale = [u for u in urls if u not in cache or now - cache[u].get('checkedAt', 0) > ttl]
+    
+    if stale:
+        for result in asyncio.run(check_links_async(stale, concurrency, timeout)):
+            cache[result['url']] = result
+        if use_cache:
+            save_link_cache(cache, cache_file)
+    
+    return [{"id": p['id'], "name": p['name'], "result": cache[p.get('buyLink', '')]} for p in products]
+
+def format_link_report(report):
+    """Tạo báo cáo dạng text: link hỏng, redirect và độ trễ"""
+    lines = []
+    broken = [r for r in report if not r['result']['ok']]
+    latencies = sorted(r['result']['latencyMs'] for r in report if r['result']['latencyMs'] is not None)
+    for r in report:
+        res = r['result']
+        mark = "✅" if res['ok'] else "❌"
+        detail = res['error'] or f"HTTP {res['status']}"
+        lines.append(f"{mark} {r['id']} - {detail} - {res['latencyMs']}ms")
+        if res['redirects']:
+            lines.append(f"    ↪ {len(res['redirects'])} redirect → {res['finalUrl']}")
+    lines.append("")
+    lines.append(f"Tổng: {len(report)} sản phẩm, {len(broken)} link hỏng")
+    if latencies:
+        lines.append(f"Độ trễ trung vị: {latencies[len(latencies) // 2]}ms, chậm nhất: {latencies[-1]}ms")
+    return "\n".join(lines)
+
+def drop_broken_from_featured(featured, report):
+    """Bỏ các sản phẩm có link hỏng khỏi danh sách featured, trả về (featured mới, đã bỏ)"""
+    broken_ids = {r['id'] for r in report if not r['result']['ok']}
+    kept = [p for p in featured if p.get('id') not in broken_ids]
+    dropped = [p for p in featured if p.get('id') in broken_ids]
+    return kept, dropped
+
+# === Tải ảnh sản phẩm từ URL ===
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.webp', '.gif')
+IMAGE_CONTENT_TYPES = {
+    'image/png': '.png', 'image/jpeg': '.jpg', 'image/jpg': '.jpg',
+    'image/webp': '.webp', 'image/gif': '.gif',
+}
+
+def is_remote_image(source):
+    """Nguồn ảnh là URL (http/https) thay vì file trên máy"""
+    return urlsplit(source or '').scheme in ('http', 'https')
+
+def find_cached_image(url, cache_dir=None):
+    """Đường dẫn ảnh đã tải của URL trong cache, None nếu chưa có"""
+    cache_dir = cache_dir or IMAGE_CACHE_DIR
+    key = hashlib.sha1(url.encode('utf-8')).hexdigest()
+    for ext in IMAGE_EXTENSIONS:
+        path = os.path.join(cache_dir, key + ext)
+        if os.path.exists(path):
+            return path
+    return None
+
+def download_image(url, cache_dir=None, timeout=20, retries=IMAGE_DOWNLOAD_RETRIES, max_redirects=5):
+    """
+    Tải 1 ảnh về cache (mỗi URL chỉ tải 1 lần), trả về đường dẫn file trong cache.
+    Lỗi mạng / HTTP 5xx / 429 được thử lại với thời gian chờ tăng dần; lỗi khác báo ngay.
+    """
+    cache_dir = cache_dir or IMAGE_CACHE_DIR
+    cached = find_cached_image(url, cache_dir)
+    if cached:
+        return cached
+    if not is_remote_image(url):
+        raise ValueError(f"URL ảnh không hợp lệ: {url}")
+    
+    for attempt in range(retries + 1):
+        try:
+            current = url
+            for _ in range(max_redirects + 1):
+                resp, body = _request('GET', current, timeout)
+                location = resp.getheader('Location')
+                if resp.status in (301, 302, 303, 307, 308) and location:
+                    current = urljoin(current, location)
+                    continue
+                break
+            else:
+                raise ValueError(f"Quá {max_redirects} lần redirect")
+            if resp.status == 429 or resp.status >= 500:
+                raise ConnectionError(f"HTTP {resp.status}")
+            if resp.status != 200:
+                raise ValueError(f"HTTP {resp.status}")
+            break
+        except (OSError, http.client.HTTPException) as e:
+            if attempt == retries:
+                raise ConnectionError(f"Tải ảnh thất bại sau {retries + 1} lần: {e}") from e
+            time.sleep(0.5 * 2 ** attempt)
+    
+    content_type = (resp.getheader('Content-Type') or '').split(';')[0].strip().lower()
+    ext = IMAGE_CONTENT_TYPES.get(content_type)
+    if ext is None:
+        ext = os.path.splitext(urlsplit(current).path)[1].lower()
+        if ext == '.jpeg':
+            ext = '.jpg'
+        if ext not in IMAGE_EXTENSIONS or content_type.startswith(('text/', 'application/json')):
+            raise ValueError(f"Không phải file ảnh ({content_type or 'không rõ định dạng'})")
+    
+    # Ghi ra file tạm rồi đổi tên để không bao giờ để lại ảnh tải dở trong cache
+    os.makedirs(cache_dir, exist_ok=True)
+    dest = os.path.join(cache_dir, hashlib.sha1(url.encode('utf-8')).hexdigest() + ext)
+    tmp_path = f"{dest}.{threading.get_ident()}.tmp"
+    with open(tmp_path, 'wb') as f:
+        f.write(body)
+    os.replace(tmp_path, dest)
+    return dest
+
+def download_images(urls, concurrency=8, cache_dir=None, timeout=20, retries=IMAGE_DOWNLOAD_RETRIES):
+    """
+    Tải nhiều ảnh song song, tối đa `concurrency` request cùng lúc (mỗi URL 1 lần).
+    Trả về {url: (đường dẫn trong cache, None) hoặc (None, lỗi)}.
+    """
+    def fetch(url):
+        try:
+            return url, (download_image(url, cache_dir, timeout, retries), None)
+        except Exception as e:
+            return url, (None, str(e) or e.__class__.__name__)
+    
+    urls = list(dict.fromkeys(urls))
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        return dict(executor.map(fetch, urls))
+
+def copy_product_image(source, product_id, versioned=False):
+    """
+    Copy ảnh (file trên máy) vào aff-data/ với tên theo id sản phẩm, trả về đường dẫn dùng trên web.
+    versioned=True (đổi ảnh sản phẩm đã có): thêm hash nội dung vào tên để không ghi đè ảnh cũ,
+    ảnh cũ còn cần cho hoàn tác và được dọn khi thao tác rời khỏi lịch sử.
+    """
+    os.makedirs(AFF_DATA_DIR, exist_ok=True)
+    img_ext = os.path.splitext(source)[1]
+    img_filename = f"{product_id}{img_ext}"
+    if versioned:
+        img_filename = f"{product_id}-{file_version(source)[:10]}{img_ext}"
+    shutil.copy2(source, os.path.join(AFF_DATA_DIR, img_filename))
+    return f"../aff-data/{img_filename}"
+
+def load_import_rows(path):
+    """
+    Đọc file nhập hàng loạt: JSON (mảng sản phẩm) hoặc CSV có các cột
+    name, image, priceNow, priceOriginal, discount, buyLink, description (mỗi dòng mô tả cách nhau bởi '|').
+    Cột image là đường dẫn file trên máy hoặc URL ảnh.
+    """
+    if path.lower().endswith('.csv'):
+        with open(path, 'r', encoding='utf-8-sig', newline='') as f:
+            rows = list(csv.DictReader(f))
+        for row in rows:
+            row['description'] = (row.get('description') or '').split('|')
+        return rows
+    with open(path, 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+def _import_field(row, key):
+    """Giá trị 1 cột của dòng nhập dạng chuỗi đã bỏ khoảng trắng (JSON có thể cho số, vd giá 1000)"""
+    value = row.get(key)
+    return '' if value is None else str(value).strip()
+
+def import_products(rows, existing_ids=(), concurrency=8, cache_dir=None, timeout=20, retries=IMAGE_DOWNLOAD_RETRIES):
+    """
+    Tạo sản phẩm mới từ các dòng nhập: ảnh dạng URL được tải song song (có cache),
+    sau đó mọi ảnh đều qua bước copy vào aff-data/ như khi thêm bằng tay.
+    Trả về (sản phẩm mới, [(tên, lỗi)] của các dòng bị bỏ qua).
+    """
+    fields = ('name', 'image', 'priceNow', 'priceOriginal', 'discount', 'buyLink')
+    entries = [
+        ({key: _import_field(row, key) for key in fields}, row.get('description')) if isinstance(row, dict) else None
+        for row in rows
+    ]
+    remote = [entry[0]['image'] for entry in entries if entry and is_remote_image(entry[0]['image'])]
+    downloads = download_images(remote, concurrency, cache_dir, timeout, retries) if remote else {}
+    
+    new_products, errors = [], []
+    seen_ids = set(existing_ids)
+    for entry in entries:
+        if entry is None:
+            errors.append(('(không tên)', "Dòng nhập không phải object sản phẩm"))
+            continue
+        row, description = entry
+        name, image = row['name'], row['image']
+        if not name or not row['priceNow'] or not row['buyLink'] or not image:
+            errors.append((name or '(không tên)', "Thiếu tên, giá, link mua hàng hoặc ảnh"))
+            continue
+        product_id = generate_id(name)
+        if product_id in seen_ids:
+            errors.append((name, f"Trùng id: {product_id}"))
+            continue
+        if is_remote_image(image):
+            image, error = downloads[image]
+            if error:
+                errors.append((name, error))
+                continue
+        elif not os.path.isfile(image):
+            errors.append((name, f"Không tìm thấy ảnh: {image}"))
+            continue
+        
+        if isinstance(description, str):
+            description = description.split('\n')
+        seen_ids.add(product_id)
+        new_products.append({
+            "id": product_id,
+            "name": name,
+            "image": copy_product_image(image, product_id),
+            "qrImage": "",
+            "priceNow": row['priceNow'],
+            "priceOriginal": row['priceOriginal'],
+            "discount": row['discount'],
+            "buyLink": row['buyLink'],
+            "description": [str(line).strip() for line in description or [] if str(line).strip()]
+        })
+    return new_products, errors
+
+def decode_thumbnail(path, size=PREVIEW_SIZE):
+    """Đọc và thu nhỏ ảnh (chạy ở thread phụ, chỉ dùng PIL, không đụng tới Tk)"""
+    with Image.open(path) as img:
+        img.draft('RGB', size)  # JPEG: giải mã thẳng ở độ phân giải thấp
+        img.thumbnail(size)
+        return img.convert('RGBA')
+
+class ThumbnailCache:
+    """
+    Cache LRU ảnh xem trước (PhotoImage) theo (đường dẫn, mtime).
+    Ảnh được giải mã ở thread phụ; PhotoImage chỉ được tạo trên main thread của Tk.
+    Khi chọn nhanh liên tục, chỉ ảnh được yêu cầu sau cùng được hiển thị.
+    """
+    
+    def __init__(self, root, capacity=PREVIEW_CACHE_SIZE):
+        self.root = root
+        self.capacity = capacity
+        self.cache = OrderedDict()
+        self.executor = ThreadPoolExecutor(max_workers=2)
+        self.pending = {}  # key -> Future đang giải mã
+        self.wanted = None  # (key, callback) của yêu cầu gần nhất
+        self.polling = False
+    
+    def request(self, path, callback):
+        """Gọi callback(PhotoImage hoặc None) khi có ảnh xem trước cho path"""
+        signature = get_file_signature(path) if path else None
+        if signature is None:
+            self.wanted = None
+            callback(None)
+            return
+        key = (path, signature[0])
+        if key in self.cache:
+            self.cache.move_to_end(key)
+            self.wanted = None
+            callback(self.cache[key])
+            return
+        
+        self.wanted = (key, callback)
+        # Bỏ các ảnh đang xếp hàng nhưng không còn cần nữa
+        for other, future in list(self.pending.items()):
+            if other != key and future.cancel():
+                del self.pending[other]
+        if key not in self.pending:
+            self.pending[key] = self.executor.submit(decode_thumbnail, path)
+        if not self.polling:
+            self.polling = True
+            self.root.after(20, self._poll)
+    
+    def _poll(self):
+        for key, future in list(self.pending.items()):
+            if not future.done():
+                continue
+            del self.pending[key]
+            try:
+                photo = ImageTk.PhotoImage(future.result())
+            except Exception as e:
+                print(f"Lỗi tạo ảnh xem trước {key[0]}: {e}")
+                photo = None
+            if photo is not None:
+                self.cache[key] = photo
+                if len(self.cache) > self.capacity:
+                    self.cache.popitem(last=False)
+            if self.wanted and self.wanted[0] == key:
+                callback = self.wanted[1]
+                self.wanted = None
+                callback(photo)
+        
+        if self.pending:
+            self.root.after(20, self._poll)
+        else:
+            self.polling = False
+    
+    def close(self):
+        self.executor.shutdown(wait=False, cancel_futures=True)
+
 class ProductManagerApp:
     def __init__(self, root):
         self.root = root
         self.root.title("Quản lý sản phẩm - Quầy Lưu Niệm")
-        self.root.geometry("950x750")
+        self.root.geometry("950x850")
         self.root.configure(bg='#1a1a1a')
         
-        self.products = load_products()
+        self.watcher = ProductsFileWatcher()
+        self.loading = None  # Iterator khi đang tải dần file lớn
+        source_size = os.path.getsize(self.watcher.path) if os.path.exists(self.watcher.path) else 0
+        if source_size > STREAM_LOAD_THRESHOLD:
+            self.products = []
+            self.loading = iter_products()
+            self.loading_signature = get_file_signature(self.watcher.path)
+            self.loading_version = catalog_version()
+        else:
+            self.products = self.watcher.load()
         self.selected_image = None
         self.editing_index = None  # Index sản phẩm đang chỉnh sửa
+        self.view_order = None  # Thứ tự hiển thị khi xem sắp xếp (None = thứ tự đã lưu)
+        self.sort_key_cache = {}  # id(sản phẩm) -> (sản phẩm, {field: khóa}), xem get_sort_keys
+        self.history = CatalogHistory(on_discard=self.purge_deleted_assets)
+        self.pending_save = None  # after() id của lần lưu đang chờ
+        self.pending_build = None  # after() id của lần build file web đang chờ (chỉ khi dùng SQLite)
+        self.thumbnails = ThumbnailCache(root) if PREVIEW_AVAILABLE else None
+        self.downloader = ThreadPoolExecutor(max_workers=2)  # Tải ảnh từ URL
         
         self.setup_ui()
         self.refresh_product_list()
+        if self.loading is not None:
+            self.root.after_idle(self.load_next_batch)
+        self.root.after(WATCH_INTERVAL_MS, self.poll_products_file)
+        # Chỉ trong cửa sổ chính (không áp dụng cho cửa sổ Modal), bỏ qua khi đang gõ trong ô nhập
+        self.root.bind('<Control-z>', lambda e: self.on_history_key(e, self.undo))
+        self.root.bind('<Control-y>', lambda e: self.on_history_key(e, self.redo))
+        self.root.protocol("WM_DELETE_WINDOW", self.on_close)
     
     def setup_ui(self):
         # Style
@@ -122,6 +1750,33 @@ class ProductManagerApp:
         
         ttk.Label(left_frame, text="Danh sách sản phẩm:").pack(anchor=tk.W)
         
+        # Chế độ xem sắp xếp (không thay đổi thứ tự đã lưu)
+        sort_frame = ttk.Frame(left_frame)
+        sort_frame.pack(fill=tk.X, pady=(5, 0))
+        
+        ttk.Label(sort_frame, text="Xem theo:", font=('Segoe UI', 9)).pack(side=tk.LEFT)
+        
+        self.sort_view_var = tk.StringVar(value=SORT_VIEWS[0][0])
+        sort_combo = ttk.Combobox(
+            sort_frame,
+            textvariable=self.sort_view_var,
+            values=[label for label, _ in SORT_VIEWS],
+            state='readonly',
+            width=20
+        )
+        sort_combo.pack(side=tk.LEFT, padx=5)
+        sort_combo.bind('<<ComboboxSelected>>', lambda e: self.refresh_product_list())
+        
+        apply_sort_btn = tk.Button(
+            sort_frame,
+            text="💾 Lưu thứ tự này",
+            bg='#333',
+            fg='white',
+            font=('Segoe UI', 9),
+            command=self.apply_sort_view
+        )
+        apply_sort_btn.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 0))
+        
         # Listbox với scrollbar
         list_frame = ttk.Frame(left_frame)
         list_frame.pack(fill=tk.BOTH, expand=True, pady=5)
@@ -134,6 +1789,7 @@ class ProductManagerApp:
             bg='#2a2a2a', 
             fg='white',
             selectbackground='#e50914',
+            selectmode=tk.EXTENDED,  # Ctrl/Shift + click để chọn nhiều sản phẩm
             font=('Segoe UI', 10),
             yscrollcommand=scrollbar.set
         )
@@ -141,6 +1797,17 @@ class ProductManagerApp:
         scrollbar.config(command=self.product_listbox.yview)
         self.product_listbox.bind('<<ListboxSelect>>', self.on_select_product)
         
+        # Xem trước ảnh sản phẩm đang chọn
+        self.preview_label = tk.Label(
+            left_frame,
+            text="Chọn sản phẩm để xem ảnh" if PREVIEW_AVAILABLE else "⚠️ Cần cài: pip install pillow để xem trước ảnh",
+            bg='#2a2a2a',
+            fg='#888',
+            font=('Segoe UI', 9),
+            height=PREVIEW_SIZE[1] // 16
+        )
+        self.preview_label.pack(fill=tk.X, pady=(5, 0))
+        
         # Buttons frame - Row 1: Edit & Delete
         btn_frame = ttk.Frame(left_frame)
         btn_frame.pack(fill=tk.X, pady=(10, 5))
@@ -248,6 +1915,30 @@ class ProductManagerApp:
         )
         move_to_btn.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(5, 0))
         
+        # Buttons frame - Row 4: Undo & Redo
+        history_frame = ttk.Frame(left_frame)
+        history_frame.pack(fill=tk.X, pady=5)
+        
+        undo_btn = tk.Button(
+            history_frame, 
+            text="↩️ Hoàn tác (Ctrl+Z)",
+            bg='#333', 
+            fg='white',
+            font=('Segoe UI', 9),
+            command=self.undo
+        )
+        undo_btn.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(0, 2))
+        
+        redo_btn = tk.Button(
+            history_frame, 
+            text="↪️ Làm lại (Ctrl+Y)",
+            bg='#333', 
+            fg='white',
+            font=('Segoe UI', 9),
+            command=self.redo
+        )
+        redo_btn.pack(side=tk.LEFT, fill=tk.X, expand=True, padx=(2, 0))
+        
         # Separator
         ttk.Separator(left_frame, orient='horizontal').pack(fill=tk.X, pady=10)
         
@@ -305,6 +1996,7 @@ class ProductManagerApp:
         self.image_label = ttk.Label(img_frame, text="Chưa chọn", foreground='#888')
         self.image_label.pack(side=tk.LEFT, padx=10)
         tk.Button(img_frame, text="Chọn ảnh", command=self.select_image, bg='#333', fg='white').pack(side=tk.RIGHT)
+        tk.Button(img_frame, text="🌐 URL", command=self.select_image_url, bg='#333', fg='white').pack(side=tk.RIGHT, padx=(0, 5))
         
         # QR code - Tự động tạo từ link
         qr_frame = ttk.Frame(fields_frame)
@@ -341,122 +2033,354 @@ class ProductManagerApp:
         )
         self.clear_btn.pack(fill=tk.X)
     
+    def save_catalog(self, changed_indices=None):
+        """
+        Lưu sản phẩm, kiểm tra xung đột với chỉnh sửa bên ngoài trước khi ghi.
+        Chỉ ghi nếu trên đĩa vẫn là phiên bản đã đọc; người khác vừa ghi xen vào thì
+        gộp thay đổi của họ rồi ghi lại.
+        Khi dùng SQLite: chỉ ghi catalog.db (changed_indices = các vị trí vừa sửa nội dung thì
+        chỉ cập nhật các dòng đó), file web được build lại sau (xem schedule_build).
+        """
+        store = get_catalog_store()
+        force = False
+        for _ in range(SAVE_CONFLICT_RETRIES + 1):
+            merged, conflicts = self.watcher.sync(self.products, force=force)
+            if conflicts:
+                keep_mine = messagebox.askyesno(
+                    "Xung đột dữ liệu",
+                    f"{len(conflicts)} sản phẩm vừa bị sửa bởi công cụ khác:\n"
+                    + "\n".join(conflicts[:10])
+                    + "\n\nGhi đè bằng thay đổi của bạn? (Không = giữ bản trên đĩa)"
+                )
+                merged, _ = self.watcher.sync(self.products, prefer='local' if keep_mine else 'remote', force=True)
+            if merged is not self.products:
+                history_stale = merged != self.products
+                self.products[:] = merged
+                if history_stale:
+                    # Chỉ số trong lịch sử không còn đúng sau khi gộp. Xóa sau khi đã nhận bản gộp
+                    # để không dọn ảnh của sản phẩm mà bản gộp giữ lại
+                    self.history.clear()
+                changed_indices = None  # Đã gộp thay đổi bên ngoài: ghi lại cả danh sách
+            try:
+                if store and changed_indices is not None:
+                    version = save_product_rows(
+                        [self.products[i] for i in changed_indices], expected_version=self.watcher.version
+                    )
+                else:
+                    version = save_products(self.products, expected_version=self.watcher.version, build=not store)
+            except CatalogConflictError:
+                force = True  # Đọc lại theo nội dung (lần ghi kia có thể trùng mtime)
+                continue
+            except CatalogLockError as e:
+                messagebox.showerror("Lỗi", f"Chưa lưu được: {e}\nThay đổi vẫn được giữ, hãy thử lại.")
+                return
+            self.watcher.mark_saved(self.products, version, changed_indices)
+            if store:
+                self.schedule_build()
+            return
+        messagebox.showerror("Lỗi", "Chưa lưu được: dữ liệu liên tục bị người khác thay đổi, hãy thử lại.")
+    
+    def load_next_batch(self):
+        """Tải thêm STREAM_BATCH sản phẩm, trang đầu hiển thị ngay trong lúc phần còn lại đang tải"""
+        if self.loading is None:
+            return
+        batch = list(itertools.islice(self.loading, STREAM_BATCH))
+        start = len(self.products)
+        self.products.extend(batch)
+        if self.view_order is None:
+            for i, product in enumerate(batch, start):
+                self.product_listbox.insert(tk.END, f"{i+1}. {product['name']} - {product['priceNow']}")
+        
+        if len(batch) < STREAM_BATCH:
+            self.loading = None
+            self.watcher.mark_loaded(self.products, self.loading_signature, self.loading_version)
+            self.refresh_product_list()
+        else:
+            self.root.after_idle(self.load_next_batch)
+    
+    def finish_loading(self):
+        """
+        Tải nốt phần còn lại (trước khi sửa/lưu để không ghi đè bằng danh sách thiếu,
+        và trước khi tính vị trí/độ dài danh sách). Giữ nguyên các sản phẩm đang chọn.
+        """
+        if self.loading is None:
+            return
+        selected = self.get_selected_indices()
+        while self.loading is not None:
+            self.load_next_batch()
+        if selected:
+            rows = {i: row for row, i in enumerate(self.view_order)} if self.view_order is not None else None
+            for i in selected:
+                self.product_listbox.selection_set(rows[i] if rows is not None else i)
+    
+    def apply_edit(self, label, ops):
+        """Áp dụng thao tác chỉnh sửa, ghi vào lịch sử hoàn tác và lưu"""
+        self.finish_loading()
+        self.flush_pending_save()
+        for op in ops:
+            apply_catalog_op(self.products, op)
+        self.history.record(label, ops)
+        # Chỉ sửa nội dung (không thêm/xóa/đổi vị trí) thì chỉ cần ghi các dòng đó
+        self.save_catalog([op[1] for op in ops] if all(op[0] == 'replace' for op in ops) else None)
+    
+    def schedule_save(self):
+        """Hẹn lưu sau SAVE_DEBOUNCE_MS, các lần gọi liên tiếp chỉ lưu 1 lần"""
+        if self.pending_save is not None:
+            self.root.after_cancel(self.pending_save)
+        self.pending_save = self.root.after(SAVE_DEBOUNCE_MS, self.flush_pending_save)
+    
+    def flush_pending_save(self):
+        """Lưu ngay nếu đang có lần lưu chờ"""
+        if self.pending_save is not None:
+            self.root.after_cancel(self.pending_save)
+            self.pending_save = None
+            self.save_catalog()
+    
+    def schedule_build(self):
+        """Hẹn build lại file web sau BUILD_DEBOUNCE_MS, nhiều lần sửa liên tiếp chỉ build 1 lần"""
+        if self.pending_build is not None:
+            self.root.after_cancel(self.pending_build)
+        self.pending_build = self.root.after(BUILD_DEBOUNCE_MS, self.flush_pending_build)
+    
+    def flush_pending_build(self):
+        """Build ngay nếu đang có lần build chờ (chỉ các file có thay đổi)"""
+        if self.pending_build is not None:
+            self.root.after_cancel(self.pending_build)
+            self.pending_build = None
+            try:
+                build_catalog_outputs(force=False)
+            except CatalogLockError:
+                self.schedule_build()  # Người khác đang ghi, thử lại sau
+    
+    def on_history_key(self, event, action):
+        """Phím tắt hoàn tác/làm lại danh sách, trừ khi focus đang ở ô nhập liệu của form"""
+        if isinstance(event.widget, (tk.Entry, tk.Text)):
+            return None
+        action()
+        return "break"
+    
+    def undo(self):
+        """Hoàn tác thao tác gần nhất"""
+        label = self.history.undo(self.products)
+        if label is None:
+            messagebox.showinfo("Thông báo", "Không còn thao tác để hoàn tác!")
+            return
+        self.clear_form()  # Sản phẩm đang sửa có thể đã đổi vị trí hoặc bị hoàn tác
+        self.refresh_product_list()
+        self.schedule_save()
+        self.root.title(f"Quản lý sản phẩm - Quầy Lưu Niệm (đã hoàn tác: {label})")
+    
+    def redo(self):
+        """Làm lại thao tác vừa hoàn tác"""
+        label = self.history.redo(self.products)
+        if label is None:
+            messagebox.showinfo("Thông báo", "Không còn thao tác để làm lại!")
+            return
+        self.clear_form()
+        self.refresh_product_list()
+        self.schedule_save()
+        self.root.title(f"Quản lý sản phẩm - Quầy Lưu Niệm (đã làm lại: {label})")
+    
+    def purge_deleted_assets(self, ops):
+        """
+        Dọn ảnh của sản phẩm đã xóa (và ảnh cũ của sản phẩm đã đổi ảnh) khi thao tác
+        không thể hoàn tác được nữa; ảnh danh sách hiện tại còn dùng thì giữ lại
+        """
+        removed = [op[2] for op in ops if op[0] in ('delete', 'replace')]
+        if removed:
+            delete_product_assets(removed, keep=self.products)
+    
+    def on_close(self):
+        """Lưu nốt thay đổi đang chờ, dọn ảnh của các sản phẩm đã xóa rồi thoát"""
+        self.flush_pending_save()
+        self.flush_pending_build()
+        if self.pending_build is not None:
+            print("⚠️ Chưa build lại được file web, chạy: python product_manager.py build")
+        self.history.clear()
+        if self.thumbnails:
+            self.thumbnails.close()
+        self.downloader.shutdown(wait=False, cancel_futures=True)
+        self.root.destroy()
+    
+    def poll_products_file(self):
+        """Định kỳ nạp lại products.json nếu bị sửa từ bên ngoài"""
+        try:
+            if self.loading is None and self.watcher.changed():
+                editing_id = self.products[self.editing_index]['id'] if self.editing_index is not None else None
+                merged, conflicts = self.watcher.sync(self.products)
+                # Có xung đột thì chưa nạp, sẽ hỏi lại khi lưu
+                if not conflicts and merged != self.products:
+                    self.products[:] = merged
+                    self.history.clear()  # Sau khi nhận bản gộp: ảnh sản phẩm còn trong bản gộp được giữ
+                    self.refresh_product_list()
+                    if editing_id is not None:
+                        ids = [p['id'] for p in self.products]
+                        if editing_id in ids:
+                            self.editing_index = ids.index(editing_id)
+                        else:
+                            self.clear_form()
+                            messagebox.showwarning("Cảnh báo", "Sản phẩm đang sửa đã bị xóa bởi công cụ khác!")
+        except Exception as e:
+            print(f"Lỗi nạp lại products.json: {e}")
+        self.root.after(WATCH_INTERVAL_MS, self.poll_products_file)
+    
     def refresh_product_list(self):
         """Cập nhật danh sách sản phẩm"""
+        sort_by = dict(SORT_VIEWS).get(self.sort_view_var.get(), [])
+        if sort_by:
+            sort_keys = self.get_sort_keys([field for field, _ in sort_by])
+            self.view_order = sorted_view(self.products, sort_by, sort_keys)
+        else:
+            self.view_order = None
+        
         self.product_listbox.delete(0, tk.END)
-        for i, product in enumerate(self.products):
+        for i in (self.view_order if self.view_order is not None else range(len(self.products))):
+            product = self.products[i]
             self.product_listbox.insert(tk.END, f"{i+1}. {product['name']} - {product['priceNow']}")
     
-    def on_select_product(self, event):
-        """Khi chọn sản phẩm trong danh sách"""
-        # Cập nhật gợi ý vị trí trong ô nhập
-        selection = self.product_listbox.curselection()
-        if selection:
-            current_pos = selection[0] + 1
-            self.position_entry.delete(0, tk.END)
-            self.position_entry.insert(0, str(current_pos))
+    def get_sort_keys(self, fields):
+        """
+        Khóa sắp xếp theo thứ tự self.products, chỉ tính cho sản phẩm mới/đã sửa.
+        Cache theo object sản phẩm: sửa, hoàn tác hay gộp đều thay bằng object mới
+        (không sửa trực tiếp) nên khóa cũ tự hết hiệu lực.
+        """
+        cache, keys = {}, []
+        for product in self.products:
+            entry = self.sort_key_cache.get(id(product))
+            if entry is None or entry[0] is not product:
+                entry = (product, {})
+            missing = [field for field in fields if field not in entry[1]]
+            if missing:
+                entry[1].update(build_sort_keys([product], missing)[0])
+            cache[id(product)] = entry
+            keys.append(entry[1])
+        self.sort_key_cache = cache  # Bỏ khóa của sản phẩm không còn trong danh sách
+        return keys
     
-    def move_up(self):
-        """Di chuyển sản phẩm lên 1 vị trí"""
+    def get_selected_indices(self):
+        """Trả về danh sách index (trong thứ tự đã lưu) của các sản phẩm đang chọn"""
         selection = self.product_listbox.curselection()
-        if not selection:
-            messagebox.showwarning("Cảnh báo", "Vui lòng chọn sản phẩm cần di chuyển!")
+        if self.view_order is not None:
+            return sorted(self.view_order[row] for row in selection)
+        return list(selection)
+    
+    def get_selected_index(self):
+        """Trả về index (trong thứ tự đã lưu) của sản phẩm đang chọn, None nếu chưa chọn"""
+        indices = self.get_selected_indices()
+        return indices[0] if indices else None
+    
+    def check_saved_order_view(self):
+        """Chỉ cho phép di chuyển thủ công khi đang xem theo thứ tự đã lưu"""
+        if self.view_order is not None:
+            messagebox.showwarning(
+                "Cảnh báo",
+                "Đang xem theo thứ tự sắp xếp!\nChọn 'Thứ tự đã lưu' để di chuyển, hoặc bấm 'Lưu thứ tự này'."
+            )
+            return False
+        return True
+    
+    def apply_sort_view(self):
+        """Lưu thứ tự đang xem thành thứ tự chính thức (1 lượt, 1 lần lưu)"""
+        self.finish_loading()  # Thứ tự đang xem phải bao gồm cả phần chưa tải xong
+        if self.view_order is None:
+            messagebox.showinfo("Thông báo", "Danh sách đang ở thứ tự đã lưu!")
             return
         
-        index = selection[0]
-        if index == 0:
-            messagebox.showinfo("Thông báo", "Sản phẩm đã ở vị trí đầu tiên!")
+        if not messagebox.askyesno("Xác nhận", f"Lưu thứ tự '{self.sort_view_var.get()}' cho toàn bộ sản phẩm?"):
             return
         
-        # Hoán đổi vị trí
-        self.products[index], self.products[index - 1] = self.products[index - 1], self.products[index]
-        save_products(self.products)
+        self.apply_edit("sắp xếp", [('permute', self.view_order)])
+        self.sort_view_var.set(SORT_VIEWS[0][0])
         self.refresh_product_list()
-        
-        # Giữ selection ở vị trí mới
-        self.product_listbox.selection_set(index - 1)
-        self.product_listbox.see(index - 1)
-        self.position_entry.delete(0, tk.END)
-        self.position_entry.insert(0, str(index))
+        messagebox.showinfo("Thành công", "Đã lưu thứ tự mới!")
     
-    def move_down(self):
-        """Di chuyển sản phẩm xuống 1 vị trí"""
-        selection = self.product_listbox.curselection()
-        if not selection:
-            messagebox.showwarning("Cảnh báo", "Vui lòng chọn sản phẩm cần di chuyển!")
+    def on_select_product(self, event):
+        """Khi chọn sản phẩm trong danh sách"""
+        # Cập nhật gợi ý vị trí trong ô nhập
+        index = self.get_selected_index()
+        if index is not None:
+            current_pos = index + 1
+            self.position_entry.delete(0, tk.END)
+            self.position_entry.insert(0, str(current_pos))
+            self.show_preview(self.products[index].get('image'))
+    
+    def show_preview(self, image_path):
+        """Hiển thị ảnh xem trước (đường dẫn dạng ../aff-data/... hoặc đường dẫn tuyệt đối)"""
+        if self.thumbnails is None:
             return
+        if image_path and not os.path.isabs(image_path):
+            image_path = os.path.normpath(os.path.join(SCRIPT_DIR, '..', image_path.replace('../', '')))
+        self.preview_label.config(image='', text="Đang tải ảnh...", height=PREVIEW_SIZE[1] // 16)
+        self.thumbnails.request(image_path, self.set_preview)
+    
+    def set_preview(self, photo):
+        if photo is None:
+            self.preview_label.config(image='', text="Không có ảnh", height=PREVIEW_SIZE[1] // 16)
+        else:
+            self.preview_label.config(image=photo, text='', height=PREVIEW_SIZE[1])
+    
+    def move_selection(self, label, target_of, edge_message):
+        """
+        Di chuyển cả nhóm sản phẩm đang chọn (giữ thứ tự tương đối, 1 lần lưu).
+        target_of(indices) trả về vị trí đích của nhóm, tính như move_order.
+        Trả về (các index đã chọn, vị trí mới của nhóm), None nếu không di chuyển.
+        """
+        self.finish_loading()
+        if not self.check_saved_order_view():
+            return None
+        indices = self.get_selected_indices()
+        if not indices:
+            messagebox.showwarning("Cảnh báo", "Vui lòng chọn sản phẩm cần di chuyển!")
+            return None
         
-        index = selection[0]
-        if index >= len(self.products) - 1:
-            messagebox.showinfo("Thông báo", "Sản phẩm đã ở vị trí cuối cùng!")
-            return
+        count = len(self.products)
+        order = move_order(count, indices, target_of(indices))
+        if order == list(range(count)):
+            messagebox.showinfo("Thông báo", edge_message)
+            return None
         
-        # Hoán đổi vị trí
-        self.products[index], self.products[index + 1] = self.products[index + 1], self.products[index]
-        save_products(self.products)
+        start = order.index(indices[0])
+        op = ('move', indices[0], start) if len(indices) == 1 else ('permute', order)
+        self.apply_edit(label, [op])
         self.refresh_product_list()
         
         # Giữ selection ở vị trí mới
-        self.product_listbox.selection_set(index + 1)
-        self.product_listbox.see(index + 1)
+        self.product_listbox.selection_set(start, start + len(indices) - 1)
+        self.product_listbox.see(start)
         self.position_entry.delete(0, tk.END)
-        self.position_entry.insert(0, str(index + 2))
+        self.position_entry.insert(0, str(start + 1))
+        return indices, start
+    
+    def move_up(self):
+        """Di chuyển sản phẩm (cả nhóm đang chọn) lên 1 vị trí"""
+        self.move_selection("di chuyển lên", lambda indices: indices[0] - 1, "Sản phẩm đã ở vị trí đầu tiên!")
+    
+    def move_down(self):
+        """Di chuyển sản phẩm (cả nhóm đang chọn) xuống 1 vị trí"""
+        self.move_selection("di chuyển xuống", lambda indices: indices[0] + 1, "Sản phẩm đã ở vị trí cuối cùng!")
     
     def move_to_top(self):
-        """Di chuyển sản phẩm lên đầu danh sách"""
-        selection = self.product_listbox.curselection()
-        if not selection:
-            messagebox.showwarning("Cảnh báo", "Vui lòng chọn sản phẩm cần di chuyển!")
-            return
-        
-        index = selection[0]
-        if index == 0:
-            messagebox.showinfo("Thông báo", "Sản phẩm đã ở vị trí đầu tiên!")
-            return
-        
-        # Lấy sản phẩm ra và chèn vào đầu
-        product = self.products.pop(index)
-        self.products.insert(0, product)
-        save_products(self.products)
-        self.refresh_product_list()
-        
-        # Chọn sản phẩm ở vị trí mới
-        self.product_listbox.selection_set(0)
-        self.product_listbox.see(0)
-        self.position_entry.delete(0, tk.END)
-        self.position_entry.insert(0, "1")
-        
-        messagebox.showinfo("Thành công", f"Đã đưa '{product['name']}' lên đầu danh sách!")
+        """Di chuyển sản phẩm (cả nhóm đang chọn) lên đầu danh sách"""
+        moved = self.move_selection("đưa lên đầu", lambda indices: 0, "Sản phẩm đã ở vị trí đầu tiên!")
+        if moved:
+            messagebox.showinfo("Thành công", f"Đã đưa {self.describe_moved(moved)} lên đầu danh sách!")
     
     def move_to_bottom(self):
-        """Di chuyển sản phẩm xuống cuối danh sách"""
-        selection = self.product_listbox.curselection()
-        if not selection:
-            messagebox.showwarning("Cảnh báo", "Vui lòng chọn sản phẩm cần di chuyển!")
-            return
-        
-        index = selection[0]
-        if index >= len(self.products) - 1:
-            messagebox.showinfo("Thông báo", "Sản phẩm đã ở vị trí cuối cùng!")
-            return
-        
-        # Lấy sản phẩm ra và thêm vào cuối
-        product = self.products.pop(index)
-        self.products.append(product)
-        save_products(self.products)
-        self.refresh_product_list()
-        
-        # Chọn sản phẩm ở vị trí mới
-        new_index = len(self.products) - 1
-        self.product_listbox.selection_set(new_index)
-        self.product_listbox.see(new_index)
-        self.position_entry.delete(0, tk.END)
-        self.position_entry.insert(0, str(new_index + 1))
-        
-        messagebox.showinfo("Thành công", f"Đã đưa '{product['name']}' xuống cuối danh sách!")
+        """Di chuyển sản phẩm (cả nhóm đang chọn) xuống cuối danh sách"""
+        moved = self.move_selection("đưa xuống cuối", lambda indices: len(self.products), "Sản phẩm đã ở vị trí cuối cùng!")
+        if moved:
+            messagebox.showinfo("Thành công", f"Đã đưa {self.describe_moved(moved)} xuống cuối danh sách!")
+    
+    def describe_moved(self, moved):
+        """Tên sản phẩm vừa di chuyển, hoặc số sản phẩm nếu di chuyển cả nhóm"""
+        indices, start = moved
+        return f"'{self.products[start]['name']}'" if len(indices) == 1 else f"{len(indices)} sản phẩm"
     
     def move_to_position(self):
         """Di chuyển sản phẩm đến vị trí cụ thể"""
+        self.finish_loading()
+        if not self.check_saved_order_view():
+            return
         selection = self.product_listbox.curselection()
         if not selection:
             messagebox.showwarning("Cảnh báo", "Vui lòng chọn sản phẩm cần di chuyển!")
@@ -474,17 +2398,20 @@ class ProductManagerApp:
             messagebox.showerror("Lỗi", f"Vị trí phải từ 1 đến {len(self.products)}!")
             return
         
-        current_index = selection[0]
         target_index = target_pos - 1  # Chuyển từ 1-based sang 0-based
         
+        if len(selection) > 1:
+            self.move_selected_to_position(list(selection), target_index)
+            return
+        
+        current_index = selection[0]
         if current_index == target_index:
             messagebox.showinfo("Thông báo", "Sản phẩm đã ở vị trí này!")
             return
         
         # Lấy sản phẩm ra và chèn vào vị trí mới
-        product = self.products.pop(current_index)
-        self.products.insert(target_index, product)
-        save_products(self.products)
+        product = self.products[current_index]
+        self.apply_edit("di chuyển", [('move', current_index, target_index)])
         self.refresh_product_list()
         
         # Chọn sản phẩm ở vị trí mới
@@ -494,14 +2421,25 @@ class ProductManagerApp:
         direction = "lên" if target_index < current_index else "xuống"
         messagebox.showinfo("Thành công", f"Đã di chuyển '{product['name']}' {direction} vị trí {target_pos}!")
     
+    def move_selected_to_position(self, indices, target_index):
+        """Di chuyển nhiều sản phẩm đến vị trí cụ thể (1 lần lưu)"""
+        self.apply_edit("di chuyển nhóm", [('permute', move_order(len(self.products), indices, target_index))])
+        self.refresh_product_list()
+        
+        # Chọn lại cả nhóm ở vị trí mới
+        start = min(target_index, len(self.products) - len(indices))
+        self.product_listbox.selection_set(start, start + len(indices) - 1)
+        self.product_listbox.see(start)
+        
+        messagebox.showinfo("Thành công", f"Đã di chuyển {len(indices)} sản phẩm đến vị trí {start + 1}!")
+    
     def edit_product(self):
         """Chỉnh sửa sản phẩm đã chọn"""
-        selection = self.product_listbox.curselection()
-        if not selection:
+        index = self.get_selected_index()
+        if index is None:
             messagebox.showwarning("Cảnh báo", "Vui lòng chọn sản phẩm cần sửa!")
             return
         
-        index = selection[0]
         product = self.products[index]
         self.editing_index = index
         
@@ -536,7 +2474,32 @@ class ProductManagerApp:
         if file_path:
             self.selected_image = file_path
             self.image_label.config(text=os.path.basename(file_path), foreground='#4ade80')
+            self.show_preview(file_path)
+    
+    def select_image_url(self):
+        """Nhập URL ảnh sản phẩm, tải ở thread phụ rồi dùng như ảnh chọn từ máy"""
+        url = simpledialog.askstring("Ảnh từ URL", "Dán link ảnh sản phẩm:", parent=self.root)
+        if not url or not url.strip():
+            return
+        url = url.strip()
+        self.image_label.config(text="Đang tải ảnh...", foreground='#fbbf24')
+        future = self.downloader.submit(download_image, url)
+        self.root.after(100, self.finish_image_download, url, future)
     
+    def finish_image_download(self, url, future):
+        """Chờ ảnh tải xong (không chặn giao diện) rồi cập nhật form"""
+        if not future.done():
+            self.root.after(100, self.finish_image_download, url, future)
+            return
+        try:
+            file_path = future.result()
+        except Exception as e:
+            self.image_label.config(text="Tải ảnh lỗi", foreground='#f87171')
+            messagebox.showerror("Lỗi", f"Không tải được ảnh:\n{url}\n\n{e}")
+            return
+        self.selected_image = file_path
+        self.image_label.config(text=os.path.basename(urlsplit(url).path) or url, foreground='#4ade80')
+        self.show_preview(file_path)
     
     def save_product(self):
         """Thêm hoặc cập nhật sản phẩm"""
@@ -558,7 +2521,8 @@ class ProductManagerApp:
             messagebox.showerror("Lỗi", "Vui lòng điền đầy đủ thông tin!")
             return
         
-        product = self.products[self.editing_index]
+        old_product = self.products[self.editing_index]
+        product = copy.deepcopy(old_product)  # Sửa trên bản sao để có thể hoàn tác
         
         # Cập nhật thông tin
         product['name'] = name
@@ -570,28 +2534,10 @@ class ProductManagerApp:
         
         # Nếu chọn ảnh mới
         if self.selected_image:
-            os.makedirs(AFF_DATA_DIR, exist_ok=True)
-            img_ext = os.path.splitext(self.selected_image)[1]
-            img_filename = f"{product['id']}{img_ext}"
-            img_dest = os.path.join(AFF_DATA_DIR, img_filename)
-            shutil.copy2(self.selected_image, img_dest)
-            product['image'] = f"../aff-data/{img_filename}"
-        
-        # Tạo lại QR nếu link thay đổi
-        if QR_AVAILABLE and buy_link:
-            try:
-                qr = qrcode.QRCode(version=1, box_size=10, border=2)
-                qr.add_data(buy_link)
-                qr.make(fit=True)
-                qr_img = qr.make_image(fill_color="black", back_color="white")
-                qr_filename = f"{product['id']}_qr.webp"
-                qr_dest = os.path.join(AFF_DATA_DIR, qr_filename)
-                qr_img.save(qr_dest, 'WEBP', quality=90)
-                product['qrImage'] = f"../aff-data/{qr_filename}"
-            except Exception as e:
-                print(f"Lỗi tạo QR: {e}")
+            product['image'] = copy_product_image(self.selected_image, product['id'], versioned=True)
         
-        save_products(self.products)
+        # QR chỉ được tạo lại khi link thay đổi (xem build_outputs)
+        self.apply_edit("cập nhật", [('replace', self.editing_index, old_product, product)])
         messagebox.showinfo("Thành công", f"Đã cập nhật sản phẩm: {name}")
         self.clear_form()
         self.refresh_product_list()
@@ -620,40 +2566,18 @@ class ProductManagerApp:
             return
         
         # Tạo ID
+        self.finish_loading()  # Thêm vào cuối danh sách đầy đủ, không phải phần đã tải
         product_id = generate_id(name)
         
-        # Đảm bảo thư mục aff-data tồn tại
-        os.makedirs(AFF_DATA_DIR, exist_ok=True)
-        
-        # Copy ảnh sản phẩm
-        img_ext = os.path.splitext(self.selected_image)[1]
-        img_filename = f"{product_id}{img_ext}"
-        img_dest = os.path.join(AFF_DATA_DIR, img_filename)
-        shutil.copy2(self.selected_image, img_dest)
-        
-        # Tự động tạo QR code từ link mua hàng
-        qr_path = ""
-        if QR_AVAILABLE and buy_link:
-            try:
-                qr = qrcode.QRCode(version=1, box_size=10, border=2)
-                qr.add_data(buy_link)
-                qr.make(fit=True)
-                qr_img = qr.make_image(fill_color="black", back_color="white")
-                
-                # Lưu dưới dạng webp
-                qr_filename = f"{product_id}_qr.webp"
-                qr_dest = os.path.join(AFF_DATA_DIR, qr_filename)
-                qr_img.save(qr_dest, 'WEBP', quality=90)
-                qr_path = f"../aff-data/{qr_filename}"
-            except Exception as e:
-                print(f"Lỗi tạo QR: {e}")
+        # Copy ảnh sản phẩm vào aff-data/
+        image_path = copy_product_image(self.selected_image, product_id)
         
-        # Tạo object sản phẩm
+        # Tạo object sản phẩm (QR được tạo tự động từ link mua hàng khi lưu)
         new_product = {
             "id": product_id,
             "name": name,
-            "image": f"../aff-data/{img_filename}",
-            "qrImage": qr_path,
+            "image": image_path,
+            "qrImage": "",
             "priceNow": price_now,
             "priceOriginal": price_original,
             "discount": discount,
@@ -661,8 +2585,7 @@ class ProductManagerApp:
             "description": [line.strip() for line in description.split('\n') if line.strip()]
         }
         
-        self.products.append(new_product)
-        save_products(self.products)
+        self.apply_edit("thêm sản phẩm", [('insert', len(self.products), new_product)])
         
         messagebox.showinfo("Thành công", f"Đã thêm sản phẩm: {name}")
         self.clear_form()
@@ -670,30 +2593,23 @@ class ProductManagerApp:
     
     def delete_product(self):
         """Xóa sản phẩm đã chọn"""
-        selection = self.product_listbox.curselection()
-        if not selection:
+        indices = self.get_selected_indices()
+        if not indices:
             messagebox.showwarning("Cảnh báo", "Vui lòng chọn sản phẩm cần xóa!")
             return
         
-        index = selection[0]
-        product = self.products[index]
+        if len(indices) == 1:
+            confirm_msg = f"Bạn có chắc muốn xóa sản phẩm:\n{self.products[indices[0]]['name']}?"
+        else:
+            confirm_msg = f"Bạn có chắc muốn xóa {len(indices)} sản phẩm đã chọn?"
         
-        if messagebox.askyesno("Xác nhận", f"Bạn có chắc muốn xóa sản phẩm:\n{product['name']}?"):
-            # Xóa ảnh nếu có
-            try:
-                img_path = os.path.join(SCRIPT_DIR, '..', product['image'].replace('../', ''))
-                if os.path.exists(img_path):
-                    os.remove(img_path)
-                if product.get('qrImage'):
-                    qr_path = os.path.join(SCRIPT_DIR, '..', product['qrImage'].replace('../', ''))
-                    if os.path.exists(qr_path):
-                        os.remove(qr_path)
-            except Exception as e:
-                print(f"Lỗi xóa ảnh: {e}")
+        if messagebox.askyesno("Xác nhận", confirm_msg):
+            # Xóa từ cuối lên để chỉ số phía trước không đổi, lưu 1 lần.
+            # Ảnh được dọn khi thao tác xóa không thể hoàn tác nữa (xem purge_deleted_assets)
+            ops = [('delete', i, self.products[i]) for i in sorted(indices, reverse=True)]
+            self.apply_edit("xóa sản phẩm", ops)
             
-            del self.products[index]
-            save_products(self.products)
-            messagebox.showinfo("Thành công", "Đã xóa sản phẩm!")
+            messagebox.showinfo("Thành công", f"Đã xóa {len(ops)} sản phẩm!")
             self.refresh_product_list()
     
     def clear_form(self):
@@ -715,6 +2631,7 @@ class ProductManagerApp:
     
     def open_modal_manager(self):
         """Mở cửa sổ quản lý Modal quảng cáo"""
+        self.finish_loading()
         ModalManagerWindow(self.root, self.products)
 
 
@@ -855,6 +2772,7 @@ class ModalManagerWindow:
             bg='#2a2a2a',
             fg='white',
             selectbackground='#10b981',
+            selectmode=tk.EXTENDED,
             font=('Segoe UI', 10),
             height=12,
             yscrollcommand=all_scrollbar.set
@@ -915,40 +2833,35 @@ class ModalManagerWindow:
             self.all_listbox.insert(tk.END, f"{product['name']}{status}")
     
     def add_to_featured(self):
-        """Thêm sản phẩm vào modal"""
+        """Thêm (nhiều) sản phẩm vào modal"""
         selection = self.all_listbox.curselection()
         if not selection:
             messagebox.showwarning("Cảnh báo", "Vui lòng chọn sản phẩm cần thêm!")
             return
         
-        if len(self.featured) >= 4:
-            messagebox.showwarning("Cảnh báo", "Modal đã đủ 4 sản phẩm!\nVui lòng xóa bớt trước khi thêm mới.")
+        if len(self.featured) >= FEATURED_SLOTS:
+            messagebox.showwarning("Cảnh báo", f"Modal đã đủ {FEATURED_SLOTS} sản phẩm!\nVui lòng xóa bớt trước khi thêm mới.")
             return
         
-        index = selection[0]
-        product = self.products[index]
+        selected_products = [self.products[i] for i in selection]
+        self.featured, added, existing, overflow = add_products_to_featured(self.featured, selected_products)
         
-        # Kiểm tra đã có trong featured chưa
-        featured_ids = [p.get('id') for p in self.featured]
-        if product['id'] in featured_ids:
+        if not added:
             messagebox.showinfo("Thông báo", "Sản phẩm này đã có trong Modal!")
             return
         
-        # Tạo object featured (chỉ lấy các trường cần thiết)
-        featured_product = {
-            "id": product['id'],
-            "name": product['name'],
-            "image": product['image'].replace('../', ''),  # Chuyển từ ../aff-data/ sang aff-data/
-            "priceNow": product['priceNow'],
-            "priceOriginal": product.get('priceOriginal', ''),
-            "buyLink": product['buyLink']
-        }
-        
-        self.featured.append(featured_product)
         save_featured(self.featured)
         self.refresh_lists()
         
-        messagebox.showinfo("Thành công", f"Đã thêm '{product['name']}' vào Modal!")
+        if len(selected_products) == 1:
+            messagebox.showinfo("Thành công", f"Đã thêm '{added[0]['name']}' vào Modal!")
+        else:
+            msg = f"Đã thêm {len(added)} sản phẩm vào Modal!"
+            if existing:
+                msg += f"\nBỏ qua {len(existing)} sản phẩm đã có."
+            if overflow:
+                msg += f"\nBỏ qua {len(overflow)} sản phẩm do Modal đã đủ {FEATURED_SLOTS} slot."
+            messagebox.showinfo("Thành công", msg)
     
     def remove_from_featured(self):
         """Xóa sản phẩm khỏi modal"""
@@ -1012,7 +2925,153 @@ class ModalManagerWindow:
         self.refresh_lists()
         self.featured_listbox.selection_set(index + 1)
 
+def cmd_check_links(args):
+    """Lệnh kiểm tra link mua hàng"""
+    products = load_products()
+    report = check_product_links(
+        products,
+        concurrency=args.concurrency,
+        timeout=args.timeout,
+        ttl=args.ttl,
+        use_cache=not args.no_cache
+    )
+    print(format_link_report(report))
+    
+    if args.prune_featured:
+        featured, dropped = drop_broken_from_featured(load_featured(), report)
+        if dropped:
+            save_featured(featured)
+            print(f"Đã bỏ {len(dropped)} sản phẩm link hỏng khỏi Modal: " + ", ".join(p['id'] for p in dropped))
+    
+    return 1 if any(not r['result']['ok'] for r in report) else 0
+
+def cmd_list(args):
+    """Lệnh liệt kê sản phẩm (đọc dần, in ngay từ sản phẩm đầu tiên)"""
+    stop = args.offset + args.limit if args.limit else None
+    for i, product in enumerate(itertools.islice(iter_products(), args.offset, stop), args.offset + 1):
+        print(f"{i}. {product['name']} - {product.get('priceNow', '')}")
+    return 0
+
+def cmd_export(args):
+    """Lệnh xuất feed sản phẩm"""
+    if args.commit:
+        committed = commit_feed(args.format)
+        if not committed:
+            print("Chưa có feed nào đang chờ để ghi nhận, hãy xuất feed trước")
+            return 1
+        print(f"✅ Đã ghi nhận feed {', '.join(committed)}, lần xuất incremental sau chỉ gồm thay đổi kể từ lần này")
+        return 0
+    fmt = args.format or 'xml'
+    output = args.output or default_feed_path(fmt, args.incremental)
+    count, deleted = export_feed(fmt, output, incremental=args.incremental, base_url=args.base_url)
+    removed_note = " (ghi dạng hết hàng)" if args.incremental else ""
+    print(f"Đã xuất {count} sản phẩm ra {output}" + (f" ({deleted} sản phẩm đã bị xóa{removed_note})" if deleted else ""))
+    if args.incremental:
+        print("Sau khi nền tảng đã lấy feed, chạy: python product_manager.py export --commit")
+    return 0
+
+def cmd_db_init(args):
+    """Lệnh chuyển dữ liệu JSON sang SQLite"""
+    if os.path.exists(CATALOG_DB_FILE) and not args.force:
+        print(f"Đã có {CATALOG_DB_FILE}, dùng --force để nhập lại từ products.json")
+        return 1
+    if os.path.exists(CATALOG_DB_FILE):
+        os.remove(CATALOG_DB_FILE)
+    count = import_catalog_to_db()
+    print(f"Đã nhập {count} sản phẩm vào {CATALOG_DB_FILE}")
+    return 0
+
+def cmd_build(args):
+    """Lệnh tạo lại các file build ra từ nguồn dữ liệu chính"""
+    global QR_OUTPUT
+    if args.qr:
+        QR_OUTPUT = args.qr
+    rebuilt = build_catalog_outputs(force=args.force)
+    print("Đã build lại: " + (", ".join(rebuilt) if rebuilt else "(không có thay đổi)"))
+    return 0
+
+def cmd_import(args):
+    """Lệnh nhập sản phẩm hàng loạt (ảnh có thể là URL, được tải song song)"""
+    rows = load_import_rows(args.file)
+    products = load_products()
+    new_products, errors = import_products(
+        rows,
+        existing_ids={p['id'] for p in products},
+        concurrency=args.concurrency,
+        timeout=args.timeout,
+        retries=args.retries
+    )
+    for name, error in errors:
+        print(f"❌ {name}: {error}")
+    if new_products:
+        for _ in range(SAVE_CONFLICT_RETRIES + 1):
+            # Đọc lại mỗi lần thử: có người ghi xen vào thì thêm vào bản mới nhất của họ
+            version = catalog_version()
+            products = load_products()
+            ids = {p['id'] for p in products}
+            try:
+                save_products(products + [p for p in new_products if p['id'] not in ids], expected_version=version)
+                break
+            except CatalogConflictError:
+                continue
+        else:
+            print("❌ Dữ liệu liên tục bị người khác thay đổi, chưa lưu được")
+            return 1
+    print(f"Đã nhập {len(new_products)}/{len(rows)} sản phẩm")
+    return 1 if errors else 0
+
+def main(argv=None):
+    """Không có tham số: mở giao diện quản lý. Có lệnh con: chạy từ dòng lệnh"""
+    parser = argparse.ArgumentParser(description="Quản lý sản phẩm Quầy Lưu Niệm")
+    subparsers = parser.add_subparsers(dest='command')
+    
+    check_parser = subparsers.add_parser('check-links', help="Kiểm tra link mua hàng của toàn bộ sản phẩm")
+    check_parser.add_argument('--concurrency', type=int, default=8, help="Số request song song (mặc định 8)")
+    check_parser.add_argument('--timeout', type=float, default=10, help="Timeout mỗi request, giây")
+    check_parser.add_argument('--ttl', type=int, default=LINK_CHECK_TTL, help="Thời gian dùng lại cache, giây")
+    check_parser.add_argument('--no-cache', action='store_true', help="Bỏ qua cache, kiểm tra lại tất cả")
+    check_parser.add_argument('--prune-featured', action='store_true', help="Bỏ sản phẩm link hỏng khỏi Modal")
+    check_parser.set_defaults(func=cmd_check_links)
+    
+    list_parser = subparsers.add_parser('list', help="Liệt kê sản phẩm")
+    list_parser.add_argument('--offset', type=int, default=0, help="Bỏ qua N sản phẩm đầu")
+    list_parser.add_argument('--limit', type=int, default=0, help="Chỉ in N sản phẩm (0 = tất cả)")
+    list_parser.set_defaults(func=cmd_list)
+    
+    export_parser = subparsers.add_parser('export', help="Xuất feed sản phẩm (CSV/JSONL/XML)")
+    export_parser.add_argument('--format', choices=sorted(FEED_WRITERS), help="Định dạng feed (mặc định xml)")
+    export_parser.add_argument('--output', '-o', help="File đầu ra (mặc định shop/feeds/products.<format>, "
+                               "bản incremental: shop/feeds/products.delta.<format>)")
+    export_parser.add_argument('--incremental', action='store_true',
+                               help="Chỉ xuất sản phẩm thay đổi/đã xóa kể từ lần feed được ghi nhận (--commit)")
+    export_parser.add_argument('--commit', action='store_true',
+                               help="Sau khi nền tảng đã lấy feed: ghi nhận lần xuất vừa rồi (mặc định mọi định dạng)")
+    export_parser.add_argument('--base-url', help="URL gốc cho link ảnh (mặc định lấy từ CNAME)")
+    export_parser.set_defaults(func=cmd_export)
+    
+    db_init_parser = subparsers.add_parser('db-init', help="Chuyển dữ liệu sang SQLite (catalog.db)")
+    db_init_parser.add_argument('--force', action='store_true', help="Ghi đè catalog.db đã có")
+    db_init_parser.set_defaults(func=cmd_db_init)
+    
+    build_parser = subparsers.add_parser('build', help="Build lại các file JSON/JS/QR có thay đổi")
+    build_parser.add_argument('--force', action='store_true', help="Build lại toàn bộ")
+    build_parser.add_argument('--qr', choices=['svg', 'webp'], help="Cách xuất QR (mặc định theo QR_OUTPUT)")
+    build_parser.set_defaults(func=cmd_build)
+    
+    import_parser = subparsers.add_parser('import', help="Nhập sản phẩm hàng loạt từ file JSON/CSV (ảnh là đường dẫn hoặc URL)")
+    import_parser.add_argument('file', help="File .json (mảng sản phẩm) hoặc .csv")
+    import_parser.add_argument('--concurrency', type=int, default=8, help="Số ảnh tải song song (mặc định 8)")
+    import_parser.add_argument('--timeout', type=float, default=20, help="Timeout mỗi request, giây")
+    import_parser.add_argument('--retries', type=int, default=IMAGE_DOWNLOAD_RETRIES, help="Số lần thử lại khi tải ảnh lỗi")
+    import_parser.set_defaults(func=cmd_import)
+    
+    args = parser.parse_args(argv)
+    if args.command is None:
+        root = tk.Tk()
+        ProductManagerApp(root)
+        root.mainloop()
+        return 0
+    return args.func(args)
+
 if __name__ == "__main__":
-    root = tk.Tk()
-    app = ProductManagerApp(root)
-    root.mainloop()
+    sys.exit(main())
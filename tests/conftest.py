@@ -0,0 +1,79 @@
+import collections
+import http.server
+import os
+import sys
+import threading
+
+import pytest
+
+# Các script Python của shop không phải package, import trực tiếp từ thư mục shop/
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'shop'))
+
+
+class StubHandler(http.server.BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'  # Keep-alive như server thật
+
+    def log_message(self, *args):
+        pass
+
+    def handle_any(self, method):
+        server = self.server
+        server.hits[(method, self.path)] += 1
+        route = server.routes.get(self.path)
+        if route is None:
+            status, headers, body = 404, {}, b'not found'
+        else:
+            status, headers, body = route(method, server.hits[(method, self.path)])
+        self.send_response(status)
+        for name, value in headers.items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if method != 'HEAD':
+            self.wfile.write(body)
+
+    def do_GET(self):
+        self.handle_any('GET')
+
+    def do_HEAD(self):
+        self.handle_any('HEAD')
+
+
+@pytest.fixture
+def stub_server():
+    """
+    Server HTTP cục bộ cho test mạng.
+    server.routes[path] = hàm(method, lần_gọi_thứ) -> (status, headers, body);
+    server.hits[(method, path)] đếm số request; server.url(path) trả về URL đầy đủ.
+    """
+    server = http.server.ThreadingHTTPServer(('127.0.0.1', 0), StubHandler)
+    server.daemon_threads = True
+    server.routes = {}
+    server.hits = collections.Counter()
+    server.url = lambda path: f"http://127.0.0.1:{server.server_port}{path}"
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def catalog_dir(tmp_path, monkeypatch):
+    """
+    Chuyển toàn bộ file dữ liệu/build của product_manager sang thư mục tạm.
+    shop/index.html được chép sang để có marker lưới sản phẩm; chưa có products.json.
+    """
+    import product_manager as pm
+    for name in ['PRODUCTS_FILE', 'PRODUCTS_JS_FILE', 'FEATURED_FILE', 'FEATURED_JS_FILE', 'SHOP_HTML_FILE',
+                 'BUILD_STATE_FILE', 'CATALOG_LOCK_FILE', 'CATALOG_DB_FILE']:
+        monkeypatch.setattr(pm, name, str(tmp_path / os.path.basename(getattr(pm, name))))
+    monkeypatch.setattr(pm, 'AFF_DATA_DIR', str(tmp_path / 'aff-data'))
+    monkeypatch.setattr(pm, '_catalog_store', None)
+    with open(os.path.join(pm.SCRIPT_DIR, 'index.html'), encoding='utf-8') as src:
+        (tmp_path / 'index.html').write_text(src.read(), encoding='utf-8')
+    # Đường dẫn ảnh dạng '../aff-data/...' được tính từ SCRIPT_DIR
+    monkeypatch.setattr(pm, 'SCRIPT_DIR', str(tmp_path / 'shop'))
+    yield tmp_path
+    if pm._catalog_store is not None:
+        pm._catalog_store.close()
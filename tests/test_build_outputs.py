@@ -0,0 +1,65 @@
+import importlib.util
+import sys
+
+import pytest
+
+import product_manager as pm
+
+PRODUCTS = [{"id": "coc", "name": "Cốc", "image": "../aff-data/coc.webp", "qrImage": "", "priceNow": "100.000đ",
+             "buyLink": "https://shopee.vn/coc", "description": ["Sứ"]}]
+
+needs_qr = pytest.mark.skipif(not pm.QR_AVAILABLE, reason="cần qrcode + pillow")
+
+
+def read(path):
+    with open(path, encoding='utf-8') as f:
+        return f.read()
+
+
+@needs_qr
+def test_qr_shipped_once_when_grid_is_prerendered(catalog_dir):
+    pm.save_products(PRODUCTS)
+    assert 'data:image/svg+xml' in read(pm.SHOP_HTML_FILE)
+    assert 'data:image/svg+xml' not in read(pm.PRODUCTS_JS_FILE)
+    assert '"description"' in read(pm.PRODUCTS_JS_FILE)  # Modal mô tả vẫn cần dữ liệu
+
+
+@needs_qr
+def test_qr_inlined_in_js_without_prerendered_grid(catalog_dir):
+    (catalog_dir / 'index.html').write_text('<div id="productsGrid"></div>', encoding='utf-8')
+    pm.save_products(PRODUCTS)
+    assert 'data:image/svg+xml' in read(pm.PRODUCTS_JS_FILE)
+
+
+def test_unchanged_catalog_is_not_rebuilt(catalog_dir):
+    pm.save_products(PRODUCTS)
+    assert pm.build_catalog_outputs(force=False) == []
+    assert 'products' in pm.build_catalog_outputs(force=True)
+
+
+def test_fingerprint_hashes_catalog_per_product(catalog_dir, monkeypatch):
+    products = [dict(PRODUCTS[0], id=f"p{i}") for i in range(3)]
+    pm.save_products(products)
+    dumps = pm.json.dumps
+    
+    def no_whole_catalog(value, *args, **kwargs):
+        assert value is not products and not (isinstance(value, list) and any(v is products for v in value)), \
+            "cả catalog bị dựng thành 1 chuỗi JSON"
+        return dumps(value, *args, **kwargs)
+    
+    monkeypatch.setattr(pm.json, 'dumps', no_whole_catalog)
+    products[1] = dict(products[1], priceNow="90.000đ")
+    rebuilt, _ = pm.build_outputs(products, [])
+    assert 'products' in rebuilt and 'shop-html' in rebuilt
+
+
+@needs_qr
+def test_qr_does_not_need_imagetk(monkeypatch):
+    """Pillow không có ImageTk (gói distro tách riêng): chỉ tắt xem trước, vẫn tạo được QR"""
+    import PIL
+    monkeypatch.delattr(PIL, 'ImageTk', raising=False)
+    monkeypatch.setitem(sys.modules, 'PIL.ImageTk', None)
+    spec = importlib.util.spec_from_file_location('product_manager_no_tk', pm.__file__)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    assert module.QR_AVAILABLE and not module.PREVIEW_AVAILABLE
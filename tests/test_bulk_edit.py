@@ -0,0 +1,52 @@
+import pytest
+
+import product_manager as pm
+
+
+def P(pid):
+    return {"id": pid, "name": pid.upper(), "image": f"../aff-data/{pid}.webp", "qrImage": f"../aff-data/{pid}_qr.webp",
+            "priceNow": "1đ", "priceOriginal": "", "buyLink": f"https://shopee.vn/{pid}"}
+
+
+@pytest.mark.parametrize('indices, target, expected', [
+    ([2, 3], 1, [0, 2, 3, 1, 4, 5]),        # Nhóm liền nhau lên 1 vị trí
+    ([1, 4], 0, [1, 4, 0, 2, 3, 5]),        # Nhóm rời rạc lên đầu, giữ thứ tự tương đối
+    ([4, 1], 4, [0, 2, 3, 5, 1, 4]),        # Chỉ số không theo thứ tự, vị trí đích tính trên phần còn lại
+    ([0], 99, [1, 2, 3, 4, 5, 0]),          # Vị trí quá cuối bị kẹp lại
+    ([5], -3, [5, 0, 1, 2, 3, 4]),
+])
+def test_move_order(indices, target, expected):
+    order = pm.move_order(6, indices, target)
+    assert order == expected
+    assert pm.apply_permutation(list('abcdef'), order) == [list('abcdef')[i] for i in expected]
+
+
+def test_add_products_to_featured_skips_existing():
+    featured = [pm.make_featured_entry(P('a'))]
+    new_featured, added, existing, overflow = pm.add_products_to_featured(featured, [P('a'), P('b')])
+    assert [f['id'] for f in new_featured] == ['a', 'b']
+    assert new_featured[1]['image'] == 'aff-data/b.webp'
+    assert ([p['id'] for p in added], [p['id'] for p in existing], overflow) == (['b'], ['a'], [])
+    assert len(featured) == 1  # Không sửa danh sách cũ
+
+
+def test_add_products_to_featured_overflow(monkeypatch):
+    monkeypatch.setattr(pm, 'FEATURED_SLOTS', 2)
+    products = [P(x) for x in 'abcd']
+    new_featured, added, existing, overflow = pm.add_products_to_featured([], products + [P('a')])
+    assert [f['id'] for f in new_featured] == ['a', 'b']
+    assert [p['id'] for p in overflow] == ['c', 'd']
+    assert [p['id'] for p in existing] == ['a']
+
+
+def test_delete_product_assets_keeps_files_still_in_use(catalog_dir):
+    aff = catalog_dir / 'aff-data'
+    aff.mkdir()
+    for name in ['a.webp', 'a_qr.webp', 'b.webp', 'b_qr.webp']:
+        (aff / name).write_bytes(b'x')
+    # 'c' dùng chung ảnh với 'b' (vd. nhập từ cùng 1 file)
+    shared = dict(P('c'), image='../aff-data/b.webp')
+    
+    deleted = pm.delete_product_assets([P('a'), P('b'), P('missing')], keep=[shared, P('x')])
+    assert deleted == 3
+    assert sorted(p.name for p in aff.iterdir()) == ['b.webp']
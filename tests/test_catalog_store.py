@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+import product_manager as pm
+
+PRODUCTS = [
+    {"id": f"p{i}", "name": f"Sản phẩm {i}", "image": "", "qrImage": "", "priceNow": f"{i}000đ",
+     "buyLink": f"https://example.com/{i}", "description": []}
+    for i in range(5)
+]
+
+
+def use_sqlite():
+    pm.save_products(PRODUCTS)
+    pm.import_catalog_to_db()
+    pm._catalog_store = None
+    return pm.get_catalog_store()
+
+
+def read_products_json():
+    with open(pm.PRODUCTS_FILE, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def test_row_update_writes_one_row_and_defers_build(catalog_dir):
+    store = use_sqlite()
+    version = pm.catalog_version()
+    statements = []
+    store.conn.set_trace_callback(statements.append)
+
+    new_version = pm.save_product_rows([dict(PRODUCTS[2], name="Đã sửa")], expected_version=version)
+
+    writes = [sql for sql in statements if sql.startswith(('UPDATE', 'INSERT', 'DELETE'))]
+    assert len(writes) == 1 and 'WHERE id' in writes[0]
+    assert new_version == version + 1
+    assert store.load_products()[2]['name'] == "Đã sửa"
+    assert read_products_json()[2]['name'] == PRODUCTS[2]['name']  # Chưa build lại
+
+    assert 'products' in pm.build_catalog_outputs(force=False)
+    assert read_products_json()[2]['name'] == "Đã sửa"
+
+
+def test_save_without_build_only_touches_db(catalog_dir):
+    use_sqlite()
+    reordered = PRODUCTS[::-1]
+    rebuilt, _ = pm.save_catalog_data(products=reordered, build=False)
+    assert rebuilt == []
+    assert pm.load_products() == reordered
+    assert read_products_json() == PRODUCTS
+
+
+def test_row_update_rejects_stale_version(catalog_dir):
+    use_sqlite()
+    version = pm.catalog_version()
+    pm.save_product_rows([dict(PRODUCTS[0], name="A")], expected_version=version)
+    with pytest.raises(pm.CatalogConflictError):
+        pm.save_product_rows([dict(PRODUCTS[1], name="B")], expected_version=version)
+    assert pm.load_products()[1]['name'] == PRODUCTS[1]['name']
@@ -0,0 +1,63 @@
+import json
+
+import pytest
+
+import product_manager as pm
+
+PRODUCTS = [
+    {"id": f"p{i}", "name": f"Sản phẩm {i}", "image": "", "qrImage": "", "priceNow": f"{i}000đ",
+     "buyLink": f"https://example.com/{i}", "description": []}
+    for i in range(3)
+]
+
+
+def read_bytes(path):
+    with open(path, 'rb') as f:
+        return f.read()
+
+
+def test_stale_version_is_rejected_without_writing(catalog_dir):
+    pm.save_products(PRODUCTS)
+    stale = pm.catalog_version()
+    pm.save_products(PRODUCTS[:2])  # Người khác ghi xen vào
+    before = read_bytes(pm.PRODUCTS_FILE)
+    
+    with pytest.raises(pm.CatalogConflictError):
+        pm.save_products(PRODUCTS + [dict(PRODUCTS[0], id='new')], expected_version=stale)
+    assert read_bytes(pm.PRODUCTS_FILE) == before
+    assert pm.save_products(PRODUCTS, expected_version=pm.catalog_version()) == pm.catalog_version()
+
+
+def test_write_lock_times_out_while_held(catalog_dir):
+    with pm.catalog_write_lock():
+        with pytest.raises(pm.CatalogLockError):
+            with pm.catalog_write_lock(timeout=0.1):
+                pass
+    with pm.catalog_write_lock(timeout=0.1):
+        pass  # Đã nhả khóa
+
+
+def test_import_merges_concurrent_write_and_retries(catalog_dir, monkeypatch):
+    pm.save_products(PRODUCTS)
+    image = catalog_dir / 'new.png'
+    image.write_bytes(b'png')
+    rows_file = catalog_dir / 'rows.json'
+    rows_file.write_text(json.dumps([{"name": "Hàng mới", "image": str(image), "priceNow": "5000đ",
+                                      "buyLink": "https://example.com/new"}]), encoding='utf-8')
+    
+    load_products = pm.load_products
+    calls = []
+    
+    def load_then_someone_writes():
+        products = load_products()
+        calls.append(len(products))
+        if len(calls) == 2:
+            # Ngay sau khi lệnh import đọc bản để ghi, công cụ khác thêm 1 sản phẩm
+            load_products_now = load_products()
+            pm.save_products(load_products_now + [dict(PRODUCTS[0], id='other', name="Người khác thêm")])
+        return products
+    
+    monkeypatch.setattr(pm, 'load_products', load_then_someone_writes)
+    assert pm.main(['import', str(rows_file)]) == 0
+    assert len(calls) == 3  # Lần ghi đầu bị từ chối, đọc lại rồi ghi lại
+    assert [p['id'] for p in load_products()] == ['p0', 'p1', 'p2', 'other', 'hang_moi']
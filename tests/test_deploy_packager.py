@@ -0,0 +1,71 @@
+import gzip
+import json
+
+import deploy_packager as dp
+
+
+def make_site(root):
+    (root / 'shop').mkdir()
+    (root / 'index.html').write_text('<h1>home</h1>', encoding='utf-8')
+    (root / 'shop' / 'app.js').write_text('console.log(1)', encoding='utf-8')
+    (root / 'logo.webp').write_bytes(b'RIFF0000WEBP')
+    (root / 'NOTES.md').write_text('internal', encoding='utf-8')
+    (root / '.gitignore').write_text('dist/', encoding='utf-8')
+    (root / 'tool.py').write_text('print(1)', encoding='utf-8')
+
+
+def site_files(dist):
+    return sorted(p.relative_to(dist / 'site').as_posix() for p in (dist / 'site').rglob('*') if p.is_file())
+
+
+def test_changes_accumulate_until_commit(tmp_path):
+    root, dist = tmp_path / 'site', tmp_path / 'dist'
+    root.mkdir()
+    make_site(root)
+
+    changes, _ = dp.package(str(root), str(dist))
+    assert changes['added'] == ['index.html', 'logo.webp', 'shop/app.js']  # .md/.py/dotfile bị loại
+    assert site_files(dist) == ['index.html', 'index.html.gz', 'logo.webp', 'shop/app.js', 'shop/app.js.gz']
+    assert gzip.decompress((dist / 'site' / 'index.html.gz').read_bytes()) == b'<h1>home</h1>'
+
+    # Chưa deploy: chạy lại vẫn xuất đủ thay đổi so với lần deploy trước
+    changes, _ = dp.package(str(root), str(dist))
+    assert changes['added'] == ['index.html', 'logo.webp', 'shop/app.js']
+    assert json.loads((dist / 'changes.json').read_text(encoding='utf-8')) == changes
+
+    assert dp.commit(str(dist))
+    changes, _ = dp.package(str(root), str(dist))
+    assert changes == {"added": [], "modified": [], "deleted": []}
+    assert site_files(dist) == []
+
+    (root / 'shop' / 'app.js').write_text('console.log(2)', encoding='utf-8')
+    (root / 'logo.webp').unlink()
+    changes, _ = dp.package(str(root), str(dist))
+    assert changes == {"added": [], "modified": ['shop/app.js'], "deleted": ['logo.webp']}
+    changes, _ = dp.package(str(root), str(dist))
+    assert changes['modified'] == ['shop/app.js']
+    assert site_files(dist) == ['shop/app.js', 'shop/app.js.gz']
+
+
+def test_full_package_and_commit_without_package(tmp_path):
+    root, dist = tmp_path / 'site', tmp_path / 'dist'
+    root.mkdir()
+    make_site(root)
+    assert not dp.commit(str(dist))
+    dp.package(str(root), str(dist))
+    dp.commit(str(dist))
+    changes, _ = dp.package(str(root), str(dist), full=True)
+    assert len(changes['added']) == 3
+
+
+def test_cli_commit(tmp_path, capsys):
+    assert dp.main(['--dist', str(tmp_path / 'dist'), '--commit']) == 1
+    assert "Chưa có gói" in capsys.readouterr().out
+
+
+def test_jsonl_feed_ships_but_root_backlog_does_not(tmp_path):
+    for rel_path in ['requests.jsonl', 'shop/feeds/products.jsonl', 'shop/feeds/products.csv', 'shop/tool.py']:
+        (tmp_path / rel_path).parent.mkdir(parents=True, exist_ok=True)
+        (tmp_path / rel_path).write_text('x', encoding='utf-8')
+    assert list(dp.iter_site_files(str(tmp_path))) == ['shop/feeds/products.csv', 'shop/feeds/products.jsonl']
+    assert dp.is_excluded('requests.jsonl') and not dp.is_excluded('shop/requests.jsonl')
@@ -0,0 +1,73 @@
+import csv
+import xml.etree.ElementTree as ET
+
+import product_manager as pm
+
+PRODUCTS = [
+    {"id": f"p{i}", "name": f"Sản phẩm {i}", "image": f"../aff-data/p{i}.webp", "qrImage": "",
+     "priceNow": f"{i + 1}00.000đ", "priceOriginal": "", "discount": "",
+     "buyLink": f"https://shopee.vn/p{i}", "description": ["Mô tả"]}
+    for i in range(3)
+]
+
+
+def feed_dirs(catalog_dir, monkeypatch):
+    monkeypatch.setattr(pm, 'FEEDS_DIR', str(catalog_dir / 'feeds'))
+    monkeypatch.setattr(pm, 'FEED_STATE_FILE', str(catalog_dir / '.feed-state.json'))
+
+
+def read_csv_ids(path):
+    with open(path, encoding='utf-8', newline='') as f:
+        return [row['id'] for row in csv.DictReader(f)]
+
+
+def test_incremental_export_keeps_full_feed(catalog_dir, monkeypatch):
+    feed_dirs(catalog_dir, monkeypatch)
+    pm.save_products(PRODUCTS)
+    assert pm.main(['export', '--format', 'csv', '--base-url', 'https://example.com']) == 0
+    full = catalog_dir / 'feeds' / 'products.csv'
+    assert read_csv_ids(full) == ['p0', 'p1', 'p2']
+
+    assert pm.main(['export', '--commit']) == 0
+
+    pm.save_products([PRODUCTS[0], dict(PRODUCTS[1], priceNow="99.000đ"), PRODUCTS[2]])
+    assert pm.main(['export', '--format', 'csv', '--incremental', '--base-url', 'https://example.com']) == 0
+    assert read_csv_ids(catalog_dir / 'feeds' / 'products.delta.csv') == ['p1']
+    assert read_csv_ids(full) == ['p0', 'p1', 'p2']
+
+
+def test_incremental_delta_accumulates_until_commit(catalog_dir, monkeypatch):
+    feed_dirs(catalog_dir, monkeypatch)
+    delta = str(catalog_dir / 'delta.csv')
+    pm.save_products(PRODUCTS)
+    pm.export_feed('csv', str(catalog_dir / 'full.csv'))
+    assert pm.commit_feed('csv') == ['csv']
+
+    pm.save_products([dict(PRODUCTS[0], priceNow="1đ"), PRODUCTS[1], PRODUCTS[2]])
+    assert pm.export_feed('csv', delta, incremental=True) == (1, 0)
+    # Nền tảng chưa lấy feed: lần xuất sau vẫn gồm thay đổi của lần trước
+    pm.save_products([dict(PRODUCTS[0], priceNow="1đ"), dict(PRODUCTS[1], priceNow="2đ")])
+    assert pm.export_feed('csv', delta, incremental=True) == (2, 1)
+    with open(delta, encoding='utf-8', newline='') as f:
+        rows = list(csv.DictReader(f))
+    assert [(row['id'], row['availability']) for row in rows] == \
+        [('p0', 'in stock'), ('p1', 'in stock'), ('p2', 'out of stock')]
+
+    assert pm.commit_feed() == ['csv']
+    assert pm.commit_feed() == []
+    assert pm.export_feed('csv', delta, incremental=True) == (0, 0)
+
+
+def test_commit_without_pending_feed(catalog_dir, monkeypatch):
+    feed_dirs(catalog_dir, monkeypatch)
+    assert pm.main(['export', '--commit']) == 1
+
+
+def test_xml_feed_is_well_formed(catalog_dir, monkeypatch):
+    feed_dirs(catalog_dir, monkeypatch)
+    pm.save_products(PRODUCTS)
+    output = str(catalog_dir / 'feed.xml')
+    count, deleted = pm.export_feed('xml', output, base_url='https://example.com')
+    assert (count, deleted) == (3, 0)
+    items = ET.parse(output).getroot().findall('./channel/item')
+    assert len(items) == 3
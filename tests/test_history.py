@@ -0,0 +1,148 @@
+import json
+import types
+
+import pytest
+
+import product_manager as pm
+
+
+def P(pid, image=None):
+    return {"id": pid, "name": pid.upper(), "image": image or f"../aff-data/{pid}.webp", "qrImage": "",
+            "priceNow": "1đ", "buyLink": "", "description": []}
+
+
+def ids(products):
+    return [p['id'] for p in products]
+
+
+OPS = [
+    ('move', 0, 3),
+    ('insert', 2, P('x')),
+    ('delete', 1, P('b')),
+    ('replace', 2, P('c'), P('c', '../aff-data/c-2.webp')),
+    ('permute', [3, 0, 4, 1, 2]),
+]
+
+
+@pytest.mark.parametrize('op', OPS, ids=[op[0] for op in OPS])
+def test_inverse_restores_list(op):
+    products = [P(x) for x in 'abcde']
+    pm.apply_catalog_op(products, op)
+    pm.apply_catalog_op(products, pm.invert_catalog_op(op))
+    assert products == [P(x) for x in 'abcde']
+
+
+def test_permute_and_its_inverse():
+    products = [P(x) for x in 'abcde']
+    pm.apply_catalog_op(products, ('permute', [3, 0, 4, 1, 2]))
+    assert ids(products) == list('daebc')
+    assert pm.invert_catalog_op(('permute', [3, 0, 4, 1, 2])) == ('permute', [1, 3, 4, 0, 2])
+
+
+def test_unknown_op_is_rejected():
+    with pytest.raises(ValueError):
+        pm.apply_catalog_op([], ('swap', 0, 1))
+    with pytest.raises(ValueError):
+        pm.invert_catalog_op(('swap', 0, 1))
+
+
+def test_undo_redo_multi_delete():
+    products = [P(x) for x in 'abcde']
+    history = pm.CatalogHistory()
+    # Như delete_product: xóa từ cuối lên
+    ops = [('delete', i, products[i]) for i in (3, 1, 0)]
+    for op in ops:
+        pm.apply_catalog_op(products, op)
+    history.record("xóa", ops)
+    assert ids(products) == ['c', 'e']
+    
+    assert history.undo(products) == "xóa"
+    assert ids(products) == list('abcde')
+    assert history.undo(products) is None
+    assert history.redo(products) == "xóa"
+    assert ids(products) == ['c', 'e']
+    assert history.redo(products) is None
+
+
+def test_depth_limit_discards_oldest():
+    discarded = []
+    history = pm.CatalogHistory(depth=2, on_discard=discarded.append)
+    products = [P(x) for x in 'abc']
+    for i in range(3):
+        op = ('move', 0, 2)
+        pm.apply_catalog_op(products, op)
+        history.record(f"move {i}", [op])
+    assert discarded == [[('move', 0, 2)]]
+    assert history.undo(products) == "move 2" and history.undo(products) == "move 1"
+    assert history.undo(products) is None
+
+
+def test_new_edit_discards_redo_branch_as_inverse():
+    discarded = []
+    history = pm.CatalogHistory(on_discard=discarded.append)
+    products = [P('a')]
+    op = ('insert', 1, P('x'))
+    pm.apply_catalog_op(products, op)
+    history.record("thêm", [op])
+    history.undo(products)
+    history.record("khác", [])
+    # Sản phẩm 'x' không còn trong danh sách lẫn lịch sử: báo như 1 thao tác xóa
+    assert discarded == [[('delete', 1, P('x'))]]
+    assert history.redo(products) is None
+
+
+# --- Dọn ảnh khi thao tác rời khỏi lịch sử (ProductManagerApp) ---
+
+def make_app(products):
+    app = pm.ProductManagerApp.__new__(pm.ProductManagerApp)
+    app.products = products
+    app.history = pm.CatalogHistory(on_discard=app.purge_deleted_assets)
+    app.watcher = pm.ProductsFileWatcher(pm.PRODUCTS_FILE)
+    return app
+
+
+def touch(catalog_dir, *names):
+    (catalog_dir / 'aff-data').mkdir(exist_ok=True)
+    for name in names:
+        (catalog_dir / 'aff-data' / name).write_bytes(name.encode())
+
+
+def test_replaced_image_survives_undo_and_is_purged_later(catalog_dir):
+    touch(catalog_dir, 'a.webp')
+    source = catalog_dir / 'new.webp'
+    source.write_bytes(b'new image')
+    app = make_app([P('a')])
+    
+    new_image = pm.copy_product_image(str(source), 'a', versioned=True)
+    assert new_image != P('a')['image']
+    assert (catalog_dir / 'aff-data' / 'a.webp').read_bytes() == b'a.webp'  # Ảnh cũ không bị ghi đè
+    
+    op = ('replace', 0, app.products[0], P('a', new_image))
+    pm.apply_catalog_op(app.products, op)
+    app.history.record("cập nhật", [op])
+    app.history.undo(app.products)
+    assert app.products[0]['image'] == '../aff-data/a.webp'
+    
+    app.history.record("khác", [])  # Bỏ nhánh làm lại: ảnh mới không còn ai dùng
+    assert sorted(p.name for p in (catalog_dir / 'aff-data').iterdir()) == ['a.webp']
+
+
+def test_merge_keeps_images_of_products_it_brings_back(catalog_dir, monkeypatch):
+    """Xóa X ở local trong khi người khác sửa X, chọn giữ bản trên đĩa: ảnh của X không được bị dọn"""
+    touch(catalog_dir, 'a.webp', 'x.webp')
+    pm.save_products([P('a'), P('x')])
+    app = make_app(None)
+    app.products = app.watcher.load()
+    
+    op = ('delete', 1, app.products[1])
+    pm.apply_catalog_op(app.products, op)
+    app.history.record("xóa sản phẩm", [op])
+    with open(pm.PRODUCTS_FILE, encoding='utf-8') as f:
+        on_disk = json.load(f)
+    on_disk[1]['name'] = "X mới"
+    pm.save_products(on_disk)
+    
+    monkeypatch.setattr(pm, 'messagebox', types.SimpleNamespace(askyesno=lambda *a: False))
+    app.save_catalog()
+    assert ids(app.products) == ['a', 'x'] and app.products[1]['name'] == "X mới"
+    assert (catalog_dir / 'aff-data' / 'x.webp').exists()
@@ -0,0 +1,99 @@
+import hashlib
+import os
+
+import pytest
+
+import product_manager as pm
+
+PNG = b'\x89PNG\r\n\x1a\n' + b'\x00' * 16
+
+
+def image(content_type='image/png', body=PNG):
+    return lambda method, count: (200, {'Content-Type': content_type}, body)
+
+
+def fail_first(status, times):
+    return lambda method, count: (status, {}, b'') if count <= times else (200, {'Content-Type': 'image/png'}, PNG)
+
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    monkeypatch.setattr(pm.time, 'sleep', lambda seconds: None)
+
+
+@pytest.mark.parametrize('status', [503, 429])
+def test_retry_on_server_error_and_rate_limit(stub_server, tmp_path, status):
+    stub_server.routes['/img'] = fail_first(status, 2)
+    path = pm.download_image(stub_server.url('/img'), str(tmp_path), timeout=5, retries=3)
+    assert stub_server.hits[('GET', '/img')] == 3
+    with open(path, 'rb') as f:
+        assert f.read() == PNG
+
+
+def test_retries_exhausted(stub_server, tmp_path):
+    stub_server.routes['/img'] = fail_first(503, 10)
+    with pytest.raises(ConnectionError, match='HTTP 503'):
+        pm.download_image(stub_server.url('/img'), str(tmp_path), timeout=5, retries=2)
+    assert stub_server.hits[('GET', '/img')] == 3
+
+
+def test_no_retry_on_404(stub_server, tmp_path):
+    results = pm.download_images([stub_server.url('/missing')], cache_dir=str(tmp_path), timeout=5, retries=3)
+    assert results[stub_server.url('/missing')] == (None, 'HTTP 404')
+    assert stub_server.hits[('GET', '/missing')] == 1
+
+
+def test_extension_from_content_type(stub_server, tmp_path):
+    stub_server.routes['/photo.png'] = image('image/webp; charset=binary')
+    path = pm.download_image(stub_server.url('/photo.png'), str(tmp_path), timeout=5)
+    assert path == os.path.join(str(tmp_path), hashlib.sha1(stub_server.url('/photo.png').encode()).hexdigest() + '.webp')
+
+
+def test_extension_from_url_when_content_type_unknown(stub_server, tmp_path):
+    stub_server.routes['/photo.jpeg'] = image('application/octet-stream')
+    assert pm.download_image(stub_server.url('/photo.jpeg'), str(tmp_path), timeout=5).endswith('.jpg')
+
+
+def test_html_is_not_an_image(stub_server, tmp_path):
+    stub_server.routes['/photo.png'] = image('text/html', b'<html>login</html>')
+    with pytest.raises(ValueError, match='text/html'):
+        pm.download_image(stub_server.url('/photo.png'), str(tmp_path), timeout=5)
+    assert os.listdir(tmp_path) == []
+
+
+def test_cache_hit_skips_network(stub_server, tmp_path):
+    stub_server.routes['/img'] = image()
+    first = pm.download_image(stub_server.url('/img'), str(tmp_path), timeout=5)
+    second = pm.download_images([stub_server.url('/img')], cache_dir=str(tmp_path), timeout=5)
+    assert second == {stub_server.url('/img'): (first, None)}
+    assert stub_server.hits[('GET', '/img')] == 1
+
+
+def test_import_strips_image_url_and_coerces_numbers(stub_server, catalog_dir):
+    stub_server.routes['/a.png'] = image()
+    rows = [
+        {"name": "Netflix 1 tháng", "image": f"  {stub_server.url('/a.png')} \n", "priceNow": 1000,
+         "priceOriginal": 2000, "discount": None, "buyLink": " https://example.com/buy ",
+         "description": ["Dòng 1", 2, "  "]},
+    ]
+    products, errors = pm.import_products(rows, cache_dir=str(catalog_dir / 'cache'), timeout=5)
+    assert errors == []
+    product = products[0]
+    assert product['image'] == f"../aff-data/{product['id']}.png"
+    assert os.path.isfile(os.path.join(pm.AFF_DATA_DIR, f"{product['id']}.png"))
+    assert (product['priceNow'], product['priceOriginal'], product['discount']) == ('1000', '2000', '')
+    assert product['buyLink'] == 'https://example.com/buy'
+    assert product['description'] == ['Dòng 1', '2']
+    assert stub_server.hits[('GET', '/a.png')] == 1
+
+
+def test_import_reports_bad_rows(stub_server, catalog_dir):
+    rows = [
+        {"name": "Không ảnh", "image": stub_server.url('/missing.png'), "priceNow": 1, "buyLink": "x"},
+        {"name": "Thiếu giá", "image": stub_server.url('/missing.png'), "buyLink": "x"},
+        "không phải object",
+    ]
+    products, errors = pm.import_products(rows, cache_dir=str(catalog_dir / 'cache'), timeout=5)
+    assert products == []
+    assert [name for name, _ in errors] == ["Không ảnh", "Thiếu giá", "(không tên)"]
+    assert errors[0][1] == 'HTTP 404'
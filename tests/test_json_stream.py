@@ -0,0 +1,60 @@
+import io
+import json
+
+import pytest
+
+import product_manager as pm
+
+SAMPLES = [
+    [],
+    [12345, 678],
+    [1.5e10, -0.25, 7],
+    [True, False, None, 0],
+    ["chuỗi có dấu tiếng Việt", "escape \\\" \n é", ""],
+    [{"id": "a", "description": ["x", "y"], "nested": {"n": [1, 2, {"k": None}]}}, [], {}],
+]
+
+
+def write_file(tmp_path, text, name='data.json'):
+    path = tmp_path / name
+    path.write_bytes(text.encode('utf-8'))
+    return str(path)
+
+
+@pytest.mark.parametrize('items', SAMPLES)
+@pytest.mark.parametrize('indent', [None, 4])
+def test_every_chunk_size(tmp_path, items, indent):
+    path = write_file(tmp_path, json.dumps(items, ensure_ascii=False, indent=indent))
+    size = len(open(path, 'rb').read())
+    for chunk_size in range(1, size + 2):
+        assert list(pm.iter_json_array(path, chunk_size=chunk_size)) == items, chunk_size
+
+
+def test_number_split_at_chunk_boundary(tmp_path):
+    path = write_file(tmp_path, '[12345, 678]')
+    assert list(pm.iter_json_array(path, chunk_size=3)) == [12345, 678]
+
+
+def test_utf8_bom_and_whitespace(tmp_path):
+    path = tmp_path / 'bom.json'
+    path.write_bytes(b'\xef\xbb\xbf \n [ 1 ,\n 2 ] \n')
+    assert list(pm.iter_json_array(str(path), chunk_size=2)) == [1, 2]
+
+
+def test_empty_file_yields_nothing(tmp_path):
+    assert list(pm.iter_json_array(write_file(tmp_path, ''))) == []
+
+
+@pytest.mark.parametrize('text', ['{"a": 1}', '[1, 2', '[1 2]', '[1,, 2]'])
+def test_invalid_input_raises(tmp_path, text):
+    with pytest.raises(ValueError):
+        list(pm.iter_json_array(write_file(tmp_path, text), chunk_size=2))
+
+
+@pytest.mark.parametrize('items', SAMPLES)
+def test_writer_matches_json_dump(items):
+    streamed = io.StringIO()
+    pm.write_json_array(streamed, iter(items))
+    expected = io.StringIO()
+    json.dump(items, expected, ensure_ascii=False, indent=4)
+    assert streamed.getvalue() == expected.getvalue()
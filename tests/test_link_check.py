@@ -0,0 +1,79 @@
+import json
+
+import product_manager as pm
+
+
+def ok(method, count):
+    return 200, {}, b'ok'
+
+
+def redirect_to(path):
+    return lambda method, count: (302, {'Location': path}, b'')
+
+
+def test_redirect_chain_is_followed(stub_server):
+    stub_server.routes.update({'/r1': redirect_to('/r2'), '/r2': redirect_to('/final'), '/final': ok})
+    result = pm.check_link(stub_server.url('/r1'), timeout=5)
+    assert result['ok'] and result['status'] == 200
+    assert result['redirects'] == [stub_server.url('/r2'), stub_server.url('/final')]
+    assert result['finalUrl'] == stub_server.url('/final')
+
+
+def test_too_many_redirects(stub_server):
+    stub_server.routes['/loop'] = redirect_to('/loop')
+    result = pm.check_link(stub_server.url('/loop'), timeout=5, max_redirects=3)
+    assert not result['ok'] and 'redirect' in result['error']
+
+
+def test_head_405_falls_back_to_get(stub_server):
+    stub_server.routes['/nohead'] = lambda method, count: (405, {}, b'') if method == 'HEAD' else (200, {}, b'ok')
+    result = pm.check_link(stub_server.url('/nohead'), timeout=5)
+    assert result['ok'] and result['status'] == 200
+    assert stub_server.hits[('HEAD', '/nohead')] == 1
+    assert stub_server.hits[('GET', '/nohead')] == 1
+
+
+def test_server_error_is_broken(stub_server):
+    stub_server.routes['/down'] = lambda method, count: (503, {}, b'busy')
+    result = pm.check_link(stub_server.url('/down'), timeout=5)
+    assert not result['ok'] and result['status'] == 503
+
+
+def test_invalid_url_is_broken():
+    result = pm.check_link('shopee.vn/abc')
+    assert not result['ok'] and result['error']
+
+
+def test_cache_reused_within_ttl(stub_server, tmp_path):
+    stub_server.routes['/p'] = ok
+    products = [{"id": "a", "name": "A", "buyLink": stub_server.url('/p')},
+                {"id": "b", "name": "B", "buyLink": stub_server.url('/p')}]
+    cache_file = str(tmp_path / 'cache.json')
+
+    report = pm.check_product_links(products, timeout=5, cache_file=cache_file)
+    assert [r['result']['ok'] for r in report] == [True, True]
+    assert stub_server.hits[('HEAD', '/p')] == 1  # Cùng URL chỉ kiểm tra 1 lần
+
+    pm.check_product_links(products, timeout=5, cache_file=cache_file)
+    assert stub_server.hits[('HEAD', '/p')] == 1  # Còn hạn: dùng cache
+
+    pm.check_product_links(products, timeout=5, cache_file=cache_file, ttl=-1)
+    assert stub_server.hits[('HEAD', '/p')] == 2  # Hết hạn: kiểm tra lại
+
+
+def test_prune_featured_from_cli(stub_server, tmp_path, monkeypatch, capsys):
+    stub_server.routes['/good'] = ok
+    products = [{"id": "good", "name": "Good", "buyLink": stub_server.url('/good')},
+                {"id": "bad", "name": "Bad", "buyLink": stub_server.url('/gone')}]
+    featured = [{"id": "good"}, {"id": "bad"}]
+    saved = []
+    monkeypatch.setattr(pm, 'LINK_CHECK_CACHE_FILE', str(tmp_path / 'cache.json'))
+    monkeypatch.setattr(pm, 'load_products', lambda: products)
+    monkeypatch.setattr(pm, 'load_featured', lambda: featured)
+    monkeypatch.setattr(pm, 'save_featured', saved.append)
+
+    assert pm.main(['check-links', '--timeout', '5', '--prune-featured']) == 1
+    assert saved == [[{"id": "good"}]]
+    out = capsys.readouterr().out
+    assert "1 link hỏng" in out and "bad" in out
+    assert json.loads((tmp_path / 'cache.json').read_text(encoding='utf-8'))
@@ -0,0 +1,87 @@
+import os
+
+import product_manager as pm
+
+def P(pid, name=None):
+    return {"id": pid, "name": name or pid.upper()}
+
+def ids(products):
+    return [p['id'] for p in products]
+
+BASE = [P('a'), P('b'), P('c')]
+
+def test_local_move_survives_remote_add():
+    local = [P('c'), P('a'), P('b')]
+    remote = BASE + [P('e')]
+    merged, conflicts = pm.merge_products(BASE, local, remote)
+    assert ids(merged) == ['c', 'a', 'b', 'e']
+    assert conflicts == []
+
+def test_remote_reorder_with_local_delete():
+    local = [P('a'), P('c')]
+    remote = [P('c'), P('b'), P('a')]
+    merged, conflicts = pm.merge_products(BASE, local, remote)
+    assert ids(merged) == ['c', 'a']
+    assert conflicts == []
+
+def test_both_sides_reorder_different_items():
+    base = [P(x) for x in 'abcde']
+    local = [P(x) for x in 'eabcd']   # e lên đầu
+    remote = [P(x) for x in 'acbde']  # đổi chỗ b, c
+    merged, _ = pm.merge_products(base, local, remote)
+    assert ids(merged) == ['e', 'a', 'c', 'b', 'd']
+
+def test_additions_on_both_sides_are_kept():
+    merged, conflicts = pm.merge_products(BASE, BASE + [P('x')], BASE + [P('y')])
+    assert ids(merged) == ['a', 'b', 'c', 'y', 'x']
+    assert conflicts == []
+
+def test_local_delete_vs_remote_edit_is_conflict():
+    remote = [P('a'), P('b', 'B2'), P('c')]
+    merged, conflicts = pm.merge_products(BASE, [P('a'), P('c')], remote)
+    assert conflicts == ['b']
+    assert pm.merge_products(BASE, [P('a'), P('c')], remote, prefer='local')[0] == [P('a'), P('c')]
+    assert pm.merge_products(BASE, [P('a'), P('c')], remote, prefer='remote')[0] == remote
+
+def test_remote_delete_vs_local_edit_is_conflict():
+    local = [P('a'), P('b', 'B2'), P('c')]
+    merged, conflicts = pm.merge_products(BASE, local, [P('a'), P('c')])
+    assert conflicts == ['b']
+    assert ids(pm.merge_products(BASE, local, [P('a'), P('c')], prefer='remote')[0]) == ['a', 'c']
+
+def test_one_sided_edits_merge_without_conflict():
+    local = [P('a', 'A2'), P('b'), P('c')]
+    remote = [P('a'), P('b'), P('c', 'C2')]
+    merged, conflicts = pm.merge_products(BASE, local, remote)
+    assert merged == [P('a', 'A2'), P('b'), P('c', 'C2')]
+    assert conflicts == []
+
+def full(products):
+    """Sản phẩm đủ trường để build được file web"""
+    return [dict(p, image=f"../aff-data/{p['id']}.webp", qrImage="", priceNow="1đ", buyLink="", description=[])
+            for p in products]
+
+def test_missing_products_file_is_not_an_empty_catalog(catalog_dir):
+    pm.save_products(full(BASE))
+    watcher = pm.ProductsFileWatcher(pm.PRODUCTS_FILE)
+    local = watcher.load()
+    local.append(full([P('d')])[0])
+    
+    os.remove(pm.PRODUCTS_FILE)  # vd git checkout đang ghi lại file
+    merged, conflicts = watcher.sync(local)
+    assert merged is local and conflicts == []
+    assert not watcher.changed()
+    
+    # Công cụ khác tạo lại file: gộp với bản gốc cũ như thường
+    pm.save_products(full(BASE + [P('e')]))
+    merged, conflicts = watcher.sync(local)
+    assert ids(merged) == ['a', 'b', 'c', 'e', 'd'] and conflicts == []
+
+def test_save_recreates_missing_products_file(catalog_dir):
+    pm.save_products(full(BASE))
+    watcher = pm.ProductsFileWatcher(pm.PRODUCTS_FILE)
+    local = watcher.load()
+    os.remove(pm.PRODUCTS_FILE)
+    merged, _ = watcher.sync(local)
+    pm.save_products(merged, expected_version=watcher.version)
+    assert ids(pm.load_products()) == ['a', 'b', 'c']
@@ -0,0 +1,28 @@
+import pytest
+
+import product_manager as pm
+
+PRODUCTS = [
+    {"id": "a", "name": "Áo", "priceNow": "300.000đ", "discount": "-5%"},
+    {"id": "b", "name": "Bút", "priceNow": "Liên hệ", "discount": ""},
+    {"id": "c", "name": "Cốc", "priceNow": "100.000đ", "discount": "-50%"},
+]
+
+def view_ids(label):
+    return [PRODUCTS[i]['id'] for i in pm.sorted_view(PRODUCTS, dict(pm.SORT_VIEWS)[label])]
+
+def test_invalid_price_is_last_in_both_directions():
+    assert view_ids("Giá tăng dần") == ['c', 'a', 'b']
+    assert view_ids("Giá giảm dần") == ['a', 'c', 'b']
+
+def test_sorted_view_does_not_touch_products():
+    before = [p['id'] for p in PRODUCTS]
+    view_ids("Tên A-Z")
+    assert [p['id'] for p in PRODUCTS] == before
+
+def test_build_sort_keys_only_requested_fields():
+    assert pm.build_sort_keys(PRODUCTS[:1], ['price']) == [{'price': 300000}]
+
+def test_sorted_view_rejects_unknown_field():
+    with pytest.raises(ValueError):
+        pm.sorted_view(PRODUCTS, [('color', False)])